@@ -70,9 +70,9 @@ class AutomaticDemo:
         deck_name = "deck1"
         print(f"{Fore.CYAN}Selected Deck: {deck_name} (Mixed Strategy Deck)")
         
-        deck_summary = self.deck_loader.get_deck_summary(deck_name)
+        bundle = self.deck_loader.prepare_deck(deck_name, max_texts=5)
         print(f"\n{Fore.WHITE}Deck Statistics:")
-        analysis = self.deck_loader.analyze_deck_composition(deck_name)
+        analysis = bundle.analysis
         print(f"  • Total Cards: {analysis['total_cards']}")
         print(f"  • Main Skills: {', '.join(list(analysis['skills'].keys())[:3])}")
         pause(2)
@@ -81,7 +81,7 @@ class AutomaticDemo:
         print(f"{Fore.WHITE}Chain 1: Analyzing deck composition...")
         print(f"{Fore.WHITE}Chain 2: Generating strategy guide...")
         
-        result = self.deck_builder.analyze_deck_simple(deck_summary)
+        result = self.deck_builder.analyze_deck_simple(bundle.summary)
         
         print(f"\n{Fore.GREEN}Result - Strategy Guide:")
         print(f"{Fore.WHITE}{result[:600]}...")
@@ -98,8 +98,7 @@ class AutomaticDemo:
         deck_name = "deck2"
         print(f"{Fore.CYAN}Selected Deck: {deck_name} (SIN Control Deck)")
         
-        deck_summary = self.deck_loader.get_deck_summary(deck_name)
-        card_texts = "\n".join(self.deck_loader.get_card_texts(deck_name)[:5])
+        bundle = self.deck_loader.prepare_deck(deck_name, max_texts=5)
         
         print_subsection("Running 4-Stage SequentialChain")
         print(f"{Fore.WHITE}Stage 1: Weakness Analysis")
@@ -107,7 +106,7 @@ class AutomaticDemo:
         print(f"{Fore.WHITE}Stage 3: Improvement Suggestions")
         print(f"{Fore.WHITE}Stage 4: Optimized Deck Configuration\n")
         
-        result = self.deck_builder.optimize_deck_complex(deck_summary, card_texts)
+        result = self.deck_builder.optimize_deck_complex(bundle.summary, bundle.top_texts)
         
         # Show key outputs
         for stage_num, (key, value) in enumerate(result.items(), 1):
@@ -165,12 +164,11 @@ class AutomaticDemo:
         deck_name = "deck3"
         print(f"{Fore.CYAN}Selected Deck: {deck_name} (MICROMON Combo Deck)")
         
-        deck_summary = self.deck_loader.get_deck_summary(deck_name)
-        card_texts = "\n".join(self.deck_loader.get_card_texts(deck_name)[:5])
+        bundle = self.deck_loader.prepare_deck(deck_name, max_texts=5)
         
         print_subsection("Running Strategy Analysis Chain")
         
-        result = self.strategy_analyzer.analyze_strategy(deck_summary, card_texts)
+        result = self.strategy_analyzer.analyze_strategy(bundle.summary, bundle.top_texts)
         
         # Show each stage
         stages = ['combo_analysis', 'game_plan', 'counter_strategies', 'matchup_guide']
@@ -197,10 +195,10 @@ class AutomaticDemo:
         deck_name = "deck1"
         print(f"{Fore.CYAN}Analyzing: {deck_name} for competitive play")
         
-        deck_summary = self.deck_loader.get_deck_summary(deck_name)
+        bundle = self.deck_loader.prepare_deck(deck_name, max_texts=5)
         
         print_subsection("Quick Tier Assessment")
-        quick_result = self.competitive_analyzer.quick_tier_assessment(deck_summary)
+        quick_result = self.competitive_analyzer.quick_tier_assessment(bundle.summary)
         print(f"{Fore.WHITE}{quick_result}")
         pause(2)
         
@@ -211,8 +209,7 @@ class AutomaticDemo:
         print(f"{Fore.WHITE}4. Tournament Preparation Guide")
         print(f"{Fore.WHITE}5. Executive Summary & Action Items\n")
         
-        card_texts = "\n".join(self.deck_loader.get_card_texts(deck_name)[:5])
-        result = self.competitive_analyzer.analyze_deck_competitive(deck_summary, card_texts)
+        result = self.competitive_analyzer.analyze_deck_competitive(bundle.summary, bundle.top_texts)
         
         # Show executive summary
         if 'executive_summary' in result:
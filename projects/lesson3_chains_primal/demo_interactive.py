@@ -99,15 +99,14 @@ class InteractiveDemo:
         print(f"{Fore.WHITE}This chain performs: Weakness Analysis → Meta Analysis → Improvements → Optimization\n")
         
         deck_name = self.select_deck()
-        deck_summary = self.deck_loader.get_deck_summary(deck_name)
-        card_texts = "\n".join(self.deck_loader.get_card_texts(deck_name)[:10])
+        bundle = self.deck_loader.prepare_deck(deck_name)
         
         print(f"\n{Fore.YELLOW}Running complex sequential chain (4 steps)...")
         
         # Toggle verbosity
         self.deck_builder.complex_chain.verbose = self.verbose
         
-        result = self.deck_builder.optimize_deck_complex(deck_summary, card_texts)
+        result = self.deck_builder.optimize_deck_complex(bundle.summary, bundle.top_texts)
         
         print(f"\n{Fore.GREEN}Chain Results:")
         for key, value in result.items():
@@ -123,15 +122,14 @@ class InteractiveDemo:
         print(f"{Fore.WHITE}This chain: Identifies Combos → Creates Game Plan → Analyzes Counters → Matchup Guide\n")
         
         deck_name = self.select_deck()
-        deck_summary = self.deck_loader.get_deck_summary(deck_name)
-        card_texts = "\n".join(self.deck_loader.get_card_texts(deck_name)[:10])
+        bundle = self.deck_loader.prepare_deck(deck_name)
         
         print(f"\n{Fore.YELLOW}Running strategy analysis chain...")
         
         # Toggle verbosity
         self.strategy_analyzer.strategy_chain.verbose = self.verbose
         
-        result = self.strategy_analyzer.analyze_strategy(deck_summary, card_texts)
+        result = self.strategy_analyzer.analyze_strategy(bundle.summary, bundle.top_texts)
         
         print(f"\n{Fore.GREEN}Strategy Analysis Results:")
         for key, value in result.items():
@@ -175,8 +173,7 @@ class InteractiveDemo:
         print(f"{Fore.WHITE}Full tournament-level analysis with 5 analytical stages\n")
         
         deck_name = self.select_deck()
-        deck_summary = self.deck_loader.get_deck_summary(deck_name)
-        card_texts = "\n".join(self.deck_loader.get_card_texts(deck_name)[:10])
+        bundle = self.deck_loader.prepare_deck(deck_name)
         
         print(f"\n{Fore.YELLOW}Choose analysis type:")
         print("1. Full Competitive Analysis (5-chain process)")
@@ -191,7 +188,7 @@ class InteractiveDemo:
             # Toggle verbosity
             self.competitive_analyzer.competitive_chain.verbose = self.verbose
             
-            result = self.competitive_analyzer.analyze_deck_competitive(deck_summary, card_texts)
+            result = self.competitive_analyzer.analyze_deck_competitive(bundle.summary, bundle.top_texts)
             
             print(f"\n{Fore.GREEN}Competitive Analysis Results:")
             
@@ -208,7 +205,7 @@ class InteractiveDemo:
         
         elif choice == "2":
             print(f"\n{Fore.YELLOW}Running quick tier assessment...")
-            result = self.competitive_analyzer.quick_tier_assessment(deck_summary)
+            result = self.competitive_analyzer.quick_tier_assessment(bundle.summary)
             print(f"\n{Fore.GREEN}Quick Assessment:")
             print(f"{Fore.WHITE}{result}")
     
@@ -268,7 +265,7 @@ class InteractiveDemo:
         print(f"\n{Fore.YELLOW}Analyzing {deck_name}...")
         
         # Get deck analysis
-        analysis = self.deck_loader.analyze_deck_composition(deck_name)
+        analysis = self.deck_loader.prepare_deck(deck_name).analysis
         
         print(f"\n{Fore.GREEN}Deck Composition Analysis:")
         print(f"{Fore.CYAN}Total Cards: {Fore.WHITE}{analysis['total_cards']}")
@@ -1,11 +1,76 @@
 """
 Data loader utility for Primal TCG deck analysis
 """
+import copy
 import json
+import mmap
 import os
-from typing import Dict, List, Any
+import sys
+from dataclasses import dataclass, replace
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
 from collections import Counter
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+# Deck files above this size are parsed straight from a memory map
+MMAP_THRESHOLD_BYTES = 1_000_000
+
+ABILITY_COST_LETTERS = frozenset('TFWSPNAX')
+
+
+def _read_json(path: str) -> Any:
+    """Parse a JSON file, memory-mapping large files when orjson is available"""
+    if orjson is None:
+        with open(path, 'r') as f:
+            return json.load(f)
+    
+    with open(path, 'rb') as f:
+        if os.path.getsize(path) <= MMAP_THRESHOLD_BYTES:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # orjson accepts a memoryview; release it before the map closes
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+class Card(NamedTuple):
+    """Compact view of the deck card fields used by the analysis"""
+    card_type: str
+    skill: Optional[str]
+    turn_count: Any
+    elements: Tuple[str, ...]
+    ability_costs: Tuple[Any, ...]
+    text: str
+
+
+def _intern(value: Any) -> Any:
+    """Intern repeated string values (types, skills, elements) shared across cards"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _to_card(card: Dict[str, Any]) -> Card:
+    """Convert a raw deck card dict into a Card"""
+    return Card(
+        card_type=_intern(card.get('cardType', 'Unknown')),
+        skill=_intern(card.get('skill')) or None,
+        turn_count=card.get('turnCount', 0),
+        elements=tuple(_intern(e) for e in card.get('element', ())),
+        ability_costs=tuple(card.get('abilityCost') or ()),
+        text=card.get('text') or ''
+    )
+
+
+@dataclass(slots=True)
+class DeckBundle:
+    """Deck data handed to the chains, built from a single scan of the deck"""
+    summary: str
+    top_texts: str
+    analysis: Dict[str, Any]
+
+
 class DeckLoader:
     def __init__(self, data_dir: str = None):
         if data_dir is None:
@@ -15,60 +80,58 @@ class DeckLoader:
         else:
             self.data_dir = data_dir
         self.decks = {}
+        self.cards: Dict[str, List[Card]] = {}
+        self._bundles = {}
         self.load_decks()
     
     def load_decks(self):
         """Load all deck JSON files from the data directory"""
+        self.cards.clear()
+        self._bundles.clear()
         for filename in os.listdir(self.data_dir):
             if filename.endswith('.json'):
-                with open(os.path.join(self.data_dir, filename), 'r') as f:
-                    deck_name = filename.replace('.json', '')
-                    self.decks[deck_name] = json.load(f)
+                deck_name = filename.replace('.json', '')
+                deck_data = _read_json(os.path.join(self.data_dir, filename))
+                self.decks[deck_name] = deck_data
+                if 'deck' in deck_data:
+                    self.cards[deck_name] = [_to_card(card) for card in deck_data['deck']]
     
     def get_deck(self, deck_name: str) -> Dict:
         """Get a specific deck by name"""
         return self.decks.get(deck_name, {})
     
-    def analyze_deck_composition(self, deck_name: str) -> Dict[str, Any]:
-        """Analyze the composition of a deck"""
-        deck_data = self.get_deck(deck_name)
-        if not deck_data or 'deck' not in deck_data:
-            return {}
-        
-        deck = deck_data['deck']
+    def _scan_deck(self, deck_name: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Compute the composition analysis and card texts in one pass over the deck"""
+        deck = self.cards.get(deck_name)
+        if deck is None:
+            return {}, []
         
-        # Analyze card types
-        card_types = Counter([card.get('cardType', 'Unknown') for card in deck])
-        
-        # Analyze skills/archetypes
-        skills = Counter([card.get('skill', 'None') for card in deck if card.get('skill')])
-        
-        # Analyze turn costs (mana curve)
-        turn_costs = Counter([card.get('turnCount', 0) for card in deck])
-        
-        # Analyze elements
-        elements = []
-        for card in deck:
-            if 'element' in card:
-                elements.extend(card['element'])
-        element_distribution = Counter(elements)
+        card_types = Counter()
+        skills = Counter()
+        turn_costs = Counter()
+        element_distribution = Counter()
+        cost_types = set()
+        texts = []
         
-        # Analyze ability costs
-        ability_costs = []
         for card in deck:
-            if 'abilityCost' in card and card['abilityCost']:
-                ability_costs.extend(card['abilityCost'])
+            # Card types, skills/archetypes and turn costs (mana curve)
+            card_types[card.card_type] += 1
+            if card.skill:
+                skills[card.skill] += 1
+            turn_costs[card.turn_count] += 1
+            
+            # Elements
+            element_distribution.update(card.elements)
+            
+            # Ability cost types: extract letter from cost (e.g., 'F' from 'F1' or just 'F')
+            for cost in card.ability_costs:
+                if isinstance(cost, str):
+                    cost_types.update(char for char in cost if char in ABILITY_COST_LETTERS)
+            
+            if card.text:
+                texts.append(card.text)
         
-        # Count unique ability cost types
-        cost_types = set()
-        for cost in ability_costs:
-            if isinstance(cost, str):
-                # Extract letter from cost (e.g., 'F' from 'F1' or just 'F')
-                for char in cost:
-                    if char in ['T', 'F', 'W', 'S', 'P', 'N', 'A', 'X']:
-                        cost_types.add(char)
-        
-        return {
+        analysis = {
             'total_cards': len(deck),
             'card_types': dict(card_types),
             'skills': dict(skills),
@@ -77,18 +140,18 @@ class DeckLoader:
             'ability_cost_types': list(cost_types),
             'deck_name': deck_name
         }
+        return analysis, texts
+    
+    def analyze_deck_composition(self, deck_name: str) -> Dict[str, Any]:
+        """Analyze the composition of a deck"""
+        return self._scan_deck(deck_name)[0]
     
     def get_card_texts(self, deck_name: str) -> List[str]:
         """Extract all card texts from a deck for analysis"""
-        deck_data = self.get_deck(deck_name)
-        if not deck_data or 'deck' not in deck_data:
-            return []
-        
-        return [card.get('text', '') for card in deck_data['deck'] if card.get('text')]
+        return self._scan_deck(deck_name)[1]
     
-    def get_deck_summary(self, deck_name: str) -> str:
-        """Get a formatted summary of deck composition"""
-        analysis = self.analyze_deck_composition(deck_name)
+    def _format_summary(self, deck_name: str, analysis: Dict[str, Any]) -> str:
+        """Format a composition analysis as a deck summary"""
         if not analysis:
             return f"Deck {deck_name} not found or empty"
         
@@ -102,10 +165,37 @@ class DeckLoader:
         
         return summary
     
+    def get_deck_summary(self, deck_name: str) -> str:
+        """Get a formatted summary of deck composition"""
+        return self._cached_bundle(deck_name).summary
+    
+    def prepare_deck(self, deck_name: str, max_texts: int = 10) -> DeckBundle:
+        """
+        Get the summary, leading card texts and analysis of a deck.
+        The deck is scanned once and the bundle is cached per deck; callers
+        get their own copy of the analysis, so changing it never alters the cache.
+        """
+        bundle = self._cached_bundle(deck_name, max_texts)
+        return replace(bundle, analysis=copy.deepcopy(bundle.analysis))
+    
+    def _cached_bundle(self, deck_name: str, max_texts: int = 10) -> DeckBundle:
+        """Shared, cached bundle of a deck (read-only)"""
+        key = (deck_name, max_texts)
+        bundle = self._bundles.get(key)
+        if bundle is None:
+            analysis, texts = self._scan_deck(deck_name)
+            bundle = DeckBundle(
+                summary=self._format_summary(deck_name, analysis),
+                top_texts="\n".join(texts[:max_texts]),
+                analysis=analysis
+            )
+            self._bundles[key] = bundle
+        return bundle
+    
     def compare_decks(self, deck1_name: str, deck2_name: str) -> Dict[str, Any]:
         """Compare two decks to identify differences and similarities"""
-        deck1_analysis = self.analyze_deck_composition(deck1_name)
-        deck2_analysis = self.analyze_deck_composition(deck2_name)
+        deck1_analysis = self._cached_bundle(deck1_name).analysis
+        deck2_analysis = self._cached_bundle(deck2_name).analysis
         
         if not deck1_analysis or not deck2_analysis:
             return {"error": "One or both decks not found"}
@@ -3,13 +3,234 @@ RetrievalQA Chain for Primal TCG Q&A System
 Implements various chain types for different query types
 """
 
-from typing import List, Dict, Any, Optional
+import asyncio
+import copy
+import re
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Any, Optional
 from langchain.chains import RetrievalQA, ConversationalRetrievalChain
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.schema import Document
 from langchain.callbacks import StdOutCallbackHandler
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+import httpx
+import tiktoken
+from utils.semantic_cache import RedisSemanticCache, SemanticCache
+
+
+# Static instructions shared by every Q&A prompt. Keeping this block first and
+# identical for all chain types lets OpenAI's automatic prompt caching (which
+# needs a 1024+ token common prefix) reuse it across calls.
+SHARED_INSTRUCTIONS = """You are part of a question answering assistant for Primal TCG, a trading card game.
+You answer questions from players about cards, decks, strategy and the comprehensive rules.
+
+GENERAL GUIDELINES
+- Base every answer on the context supplied at the end of this prompt. The context is retrieved
+  from three sources: individual card records, chunks of the comprehensive rules, and deck lists
+  with composition summaries.
+- If the context does not contain the information needed, say so plainly instead of guessing.
+  Never invent card names, card effects, costs, stats or rule numbers.
+- When the context and general TCG knowledge disagree, the context wins. Primal TCG has its own
+  terminology and some words mean something different than in other card games.
+- Quote card names exactly as they appear in the context, including set prefixes such as "Set 3:".
+- Keep answers focused on the question. Prefer short paragraphs, bullet lists and tables over long
+  prose. Do not repeat the question back to the player.
+- When a rule has exceptions, mention the exception and the condition that triggers it.
+- When recommending cards, explain why each card fits: shared Symbols, Attributes, Characteristics,
+  cost curve, or a specific effect interaction.
+
+FORMATTING RULES
+- Use markdown. Use a table when listing three or more cards or comparing several options.
+- Card tables use the columns that are relevant to the question, chosen from:
+  Name | Type | Cost | Elements | Attribute | Effect | Rarity.
+- Write costs the way they are printed on the card record, for example "1 F F" or "X A F".
+  A number is Neutral Essence; each letter is one Essence of that Symbol.
+- Write stat values as Lead/Support, for example "8/0" for a Healthy Character.
+- Cite comprehensive rules by section number when the context includes one, for example "(Rule 6.1.2.1)".
+- Put keywords and effect types in capitals the way cards print them: TRIGGER, ACTIVATE, ONGOING.
+
+GLOSSARY OF PRIMAL TCG TERMS
+- Symbol: the suit of a card (Necro, Water, Terra, Fire, Air, Plasma). A card with several Symbols
+  has all of them at once. Card records list Symbols in the "Elements" field.
+- Turn Marker: counts the turns a player has taken. A card's Turn Cost must be less than or equal
+  to its owner's Turn Marker to Summon or Play it.
+- Turn Cost: the number on the 10-sided die icon of Character and Strategy cards.
+- Hand Cost: the number of cards with a matching Symbol that must be Moved from the Hand to the
+  Essence Area to Summon a Character or Play a Strategy.
+- Essence Area: the resource zone. Essence Costs are paid by Moving cards of the matching Symbol
+  from the Essence Area to the Discard Pile. Charging a card means Moving it to the Essence Area.
+- Neutral Essence: a cost that can be paid with cards of any Symbol. X means any amount, including 0.
+- Discard Pile (DP): where cards go when they are no longer used.
+- Expel: Moving a card to the Expel Area, where it is harder to access.
+- Kingdom: the in play area where a player's Characters wait in Teams and Permanent Strategies stay.
+- Team: a stack of Characters. The top card is the Team Leader and adds its Lead value; the cards
+  below are Team Support and add their Support values. The total is the Team Power.
+- Healthy / Injured: a Healthy Character is vertical. One Damage makes it Injured (horizontal);
+  Damage to an Injured Character Discards it. Effects of Injured Characters do not apply unless
+  they start with "Valid:".
+- Showdown: the Battle Phase step that compares Team Power. Results are Victory, Outstanding Victory
+  (a difference of 5 or more), Stalemate, Battle Reward and Outstanding Battle Reward.
+- Battle Reward (BR): cards won from battles. Winning Battle Rewards is how the game is won.
+- Stand-by: a Character that is not on the Battlefield.
+- User: the Character on the Battlefield that uses an Ability card. Ability cards may list
+  Requirements the User must meet.
+- Chain: the stack of effects waiting to resolve. Players add effects with Priority and the Chain
+  resolves last in, first out.
+- ACTIVATE effects are used by the player with Priority; TRIGGER effects start when their timing
+  condition happens; ONGOING effects apply continuously while the card is in play.
+- Keywords: Transformation, Camouflage, Unique, Counter, Permanent, Permanent (X), Expert, Rebirth,
+  Promote, Rush, Achromatic, Shift, Calling, Flood and Ascend. Treat their meaning as defined in the
+  rules context when it is provided.
+- Negate: a Negated effect cannot be activated or applied; a Negated effect on the Chain does nothing.
+
+EXAMPLES OF GOOD ANSWERS
+Question: Can an Injured Character use its TRIGGER effect?
+Answer: Only if the effect starts with "Valid:". Injured Characters cannot activate, resolve or
+otherwise apply their Effect text unless the Effect is marked Valid (Rule 6.2.3.1).
+
+Question: What does a cost of "2 F F" mean?
+Answer: Pay 2 Neutral Essence (cards of any Symbol) plus 2 Fire Essence by Moving those cards from
+your Essence Area to the Discard Pile, for 4 cards in total.
+"""
+
+# Routing keywords per chain type, in priority order (first category wins)
+QUERY_TYPE_KEYWORDS = (
+    ('deck_building', ('deck', 'build', 'synergy', 'combo', 'works with')),
+    ('card_search', ('show', 'list', 'find', 'search', 'all cards')),
+    ('rules', ('rule', 'how', 'when', 'trigger', 'phase', 'can i')),
+    ('comparison', ('compare', 'versus', 'vs', 'better', 'difference')),
+)
+
+_TYPE_PRIORITY = {
+    chain_type: priority
+    for priority, (chain_type, _) in enumerate(QUERY_TYPE_KEYWORDS)
+}
+
+# One named group per chain type, in priority order, inside a zero-width
+# lookahead. finditer reports every keyword start (overlaps included) and
+# match.lastgroup names the highest-priority chain type matching there.
+_KEYWORD_PATTERN = re.compile(
+    '(?=' + '|'.join(
+        f"(?P<{chain_type}>" + '|'.join(map(re.escape, keywords)) + ')'
+        for chain_type, keywords in QUERY_TYPE_KEYWORDS
+    ) + ')'
+)
+
+
+@lru_cache(maxsize=4096)
+def _classify_query(query_lower: str) -> str:
+    """Route a lowercased query to a chain type (memoized for repeated queries)"""
+    best = len(QUERY_TYPE_KEYWORDS)
+    for match in _KEYWORD_PATTERN.finditer(query_lower):
+        best = min(best, _TYPE_PRIORITY[match.lastgroup])
+        if best == 0:
+            break
+
+    return QUERY_TYPE_KEYWORDS[best][0] if best < len(QUERY_TYPE_KEYWORDS) else 'general'
+
+
+# Dynamic part of every Q&A prompt; always placed at the very end
+DYNAMIC_TAIL = """
+---
+Context:
+{context}
+
+Question:
+{question}
+
+Answer:"""
+
+
+# Cache-augmented generation: the whole corpus follows the shared instructions,
+# so it is part of the cacheable prefix. {context} stays in the tail (empty,
+# since nothing is retrieved) because the stuff chain requires it.
+CAG_CORPUS_HEADER = """
+KNOWLEDGE BASE
+The following cards, rules and decks are the context for every question.
+
+"""
+
+CAG_TAIL = """
+---
+{context}
+Question:
+{question}
+
+Answer:"""
+
+
+class _NoRetriever(BaseRetriever):
+    """Retriever stub for CAG mode, where the corpus is already in the prompt"""
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return []
+
+
+class _PerLoopAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async HTTP/2 transport that keeps a separate connection pool per event loop.
+    
+    Pooled connections belong to the loop that opened them, and the demos run
+    several asyncio.run() loops over one shared client. Each loop gets its own
+    pool on first use; a closed loop's pool is dropped with the loop.
+    """
+    
+    def __init__(self, limits: httpx.Limits):
+        self._limits = limits
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = \
+            weakref.WeakKeyDictionary()
+    
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        """Connection pool of the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(http2=True, limits=self._limits)
+            self._transports[loop] = transport
+        return transport
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+    
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def create_shared_llm(model: str = "gpt-3.5-turbo",
+                      temperature: float = 0.3,
+                      max_connections: int = 64) -> ChatOpenAI:
+    """
+    Create one ChatOpenAI instance to share between chains.
+    
+    The HTTP/2 clients multiplex concurrent requests (batching, streaming,
+    async queries) over a pooled connection instead of opening new TLS
+    connections per request. The async client pools per event loop, so it
+    is safe to use from successive asyncio.run() calls.
+    
+    Args:
+        model: OpenAI chat model name
+        temperature: Sampling temperature
+        max_connections: Connection pool size
+        
+    Returns:
+        Configured ChatOpenAI instance
+    """
+    limits = httpx.Limits(max_connections=max_connections)
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_retries=2,
+        timeout=30,
+        http_client=httpx.Client(http2=True, limits=limits),
+        http_async_client=httpx.AsyncClient(transport=_PerLoopAsyncTransport(limits))
+    )
 
 
 class PrimalTCGQAChain:
@@ -18,178 +239,224 @@ class PrimalTCGQAChain:
     Supports multiple chain types and custom prompts for deck building.
     """
     
-    def __init__(self, retriever, llm=None, verbose: bool = False):
-        """
-        Initialize QA chain.
-        
-        Args:
-            retriever: Langchain retriever
-            llm: Language model (defaults to ChatOpenAI)
-            verbose: Enable verbose output
-        """
-        self.retriever = retriever
-        self.llm = llm or ChatOpenAI(temperature=0.3, model="gpt-3.5-turbo")
-        self.verbose = verbose
-        
-        # Initialize different chain types
-        self.chains = {}
-        self._initialize_chains()
-        
-    def _initialize_chains(self):
-        """Initialize different chain types with custom prompts"""
-        
-        # Deck Building Chain
-        deck_building_prompt = PromptTemplate(
-            template="""You are a Primal TCG deck building expert. Use the following pieces of context to answer the deck building question.
+    # Chain-specific instructions, placed after the shared static prefix
+    _INSTRUCTIONS = {
+        # Deck Building
+        'deck_building': """
+ROLE: You are a Primal TCG deck building expert. Use the context to answer the deck building question.
 Focus on card synergies, mana curves, and competitive viability.
 
-Context:
-{context}
-
-Question: {question}
-
 Provide a detailed answer with:
 1. Specific card recommendations (in a markdown table if multiple cards)
 2. Synergy explanations
 3. Deck building strategy
 4. Any important rules interactions
-
-Answer:""",
-            input_variables=["context", "question"]
-        )
-        
-        self.chains['deck_building'] = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            chain_type_kwargs={"prompt": deck_building_prompt},
-            verbose=self.verbose,
-            return_source_documents=True
-        )
-        
-        # Card Search Chain
-        card_search_prompt = PromptTemplate(
-            template="""You are a Primal TCG card database assistant. Use the following card information to answer the query.
+""",
+        # Card Search
+        'card_search': """
+ROLE: You are a Primal TCG card database assistant. Use the card information in the context to answer the query.
 Format card lists as markdown tables when showing multiple cards.
 
-Context:
-{context}
-
-Question: {question}
-
 Format the response as follows:
 1. If showing multiple cards, use a markdown table with columns: Name | Type | Cost | Effect | Rarity
 2. Group cards by relevant categories (element, cost, etc.)
 3. Highlight key cards with brief explanations
-
-Answer:""",
-            input_variables=["context", "question"]
-        )
-        
-        self.chains['card_search'] = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            chain_type_kwargs={"prompt": card_search_prompt},
-            verbose=self.verbose,
-            return_source_documents=True
-        )
-        
-        # Rules Clarification Chain
-        rules_prompt = PromptTemplate(
-            template="""You are a Primal TCG rules judge. Use the following rules context to provide accurate rulings.
+""",
+        # Rules Clarification
+        'rules': """
+ROLE: You are a Primal TCG rules judge. Use the rules context to provide accurate rulings.
 Be precise and cite specific rule sections when possible.
 
-Context:
-{context}
-
-Question: {question}
-
 Provide:
 1. Clear answer to the rules question
 2. Relevant rule citations
 3. Examples if helpful
 4. Common misconceptions if applicable
-
-Answer:""",
-            input_variables=["context", "question"]
-        )
-        
-        self.chains['rules'] = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            chain_type_kwargs={"prompt": rules_prompt},
-            verbose=self.verbose,
-            return_source_documents=True
-        )
-        
-        # General/Default Chain
-        general_prompt = PromptTemplate(
-            template="""You are a helpful Primal TCG assistant. Use the following context to answer the question.
+""",
+        # General/Default
+        'general': """
+ROLE: You are a helpful Primal TCG assistant. Use the context to answer the question.
 If the question involves cards, format them clearly. If it's about rules, be precise.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer:""",
-            input_variables=["context", "question"]
-        )
-        
-        self.chains['general'] = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            chain_type_kwargs={"prompt": general_prompt},
-            verbose=self.verbose,
-            return_source_documents=True
-        )
-        
-        # Comparison Chain
-        comparison_prompt = PromptTemplate(
-            template="""You are a Primal TCG analyst. Compare and contrast the items in question using the context provided.
+""",
+        # Comparison
+        'comparison': """
+ROLE: You are a Primal TCG analyst. Compare and contrast the items in question using the context provided.
 Use tables or structured formats for clear comparison.
 
-Context:
-{context}
-
-Question: {question}
-
 Provide:
 1. Clear comparison table if applicable
 2. Pros and cons of each option
 3. Situational recommendations
 4. Overall verdict
-
-Answer:""",
+"""
+    }
+    
+    # Prompt templates are compiled once and shared by every instance
+    _PROMPTS = {
+        chain_type: PromptTemplate(
+            template=SHARED_INSTRUCTIONS + instructions + DYNAMIC_TAIL,
             input_variables=["context", "question"]
         )
+        for chain_type, instructions in _INSTRUCTIONS.items()
+    }
+    
+    def __init__(self,
+                 retriever,
+                 llm=None,
+                 verbose: bool = False,
+                 embeddings=None,
+                 cache_threshold: float = 0.9,
+                 cache_max_entries: Optional[int] = 256,
+                 redis_url: Optional[str] = None,
+                 retrieval_mode: str = 'retrieval',
+                 corpus: Optional[List[Document]] = None,
+                 max_corpus_tokens: int = 100_000):
+        """
+        Initialize QA chain.
         
-        self.chains['comparison'] = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            chain_type_kwargs={"prompt": comparison_prompt},
-            verbose=self.verbose,
-            return_source_documents=True
+        Args:
+            retriever: Langchain retriever (ignored in 'cag' mode)
+            llm: Language model (defaults to ChatOpenAI)
+            verbose: Enable verbose output
+            embeddings: Embedding model used for the semantic response cache
+                (the cache is disabled when not provided)
+            cache_threshold: Cosine similarity required for a cache hit
+            cache_max_entries: Entries kept per chain type by the in-memory
+                cache (least recently used are evicted; None for no limit)
+            redis_url: Keep the semantic cache in Redis (shared across
+                processes and runs) instead of in memory
+            retrieval_mode: 'retrieval' to search the vector store per query, or
+                'cag' (cache-augmented generation) to put the whole corpus in
+                the static prompt prefix and skip retrieval
+            corpus: Documents to embed in the prompt in 'cag' mode
+            max_corpus_tokens: Upper bound on the corpus size in 'cag' mode
+        """
+        if retrieval_mode not in ('retrieval', 'cag'):
+            raise ValueError(f"Unknown retrieval_mode: {retrieval_mode}")
+        
+        self.retrieval_mode = retrieval_mode
+        self.verbose = verbose
+        
+        if retrieval_mode == 'cag':
+            if not corpus:
+                raise ValueError("CAG mode requires the corpus documents.")
+            # The corpus needs a long-context model
+            self.llm = llm or ChatOpenAI(temperature=0.3, model="gpt-4o-mini")
+            self.retriever = _NoRetriever()
+            self._prompts = self._build_cag_prompts(corpus, max_corpus_tokens)
+        else:
+            self.llm = llm or ChatOpenAI(temperature=0.3, model="gpt-3.5-turbo")
+            self.retriever = retriever
+            self._prompts = self._PROMPTS
+        
+        # Semantic cache: near-duplicate questions reuse an earlier answer
+        self.embeddings = embeddings
+        if not embeddings:
+            self.cache = None
+        elif redis_url:
+            self.cache = RedisSemanticCache(redis_url, threshold=cache_threshold)
+        else:
+            self.cache = SemanticCache(threshold=cache_threshold, max_entries=cache_max_entries)
+        
+        # Exact repeats of a question skip the embedding request (LRU by question text)
+        self.cache_max_entries = cache_max_entries
+        self._question_embeddings = OrderedDict()
+        
+        # Chains are built on first use; a session typically needs one or two
+        self.chains = {}
+        
+    def _get_chain(self, chain_type: str) -> RetrievalQA:
+        """
+        Get the chain for a query type, building it on first use.
+        
+        Unknown chain types fall back to the general chain.
+        """
+        if chain_type not in self._prompts:
+            chain_type = 'general'
+        
+        chain = self.chains.get(chain_type)
+        if chain is None:
+            # Every template starts with the shared instructions and ends with the
+            # dynamic context/question, so the static prefix is identical across calls
+            # and chain types and can be served from the provider's prompt cache.
+            chain = self.chains[chain_type] = RetrievalQA.from_chain_type(
+                llm=self.llm,
+                chain_type="stuff",
+                retriever=self.retriever,
+                chain_type_kwargs={"prompt": self._prompts[chain_type]},
+                verbose=self.verbose,
+                return_source_documents=True
+            )
+        return chain
+    
+    @classmethod
+    def _build_cag_prompts(cls, corpus: List[Document], max_corpus_tokens: int) -> Dict[str, PromptTemplate]:
+        """
+        Build prompts that carry the whole corpus in their static prefix.
+        
+        Args:
+            corpus: Documents to include
+            max_corpus_tokens: Maximum allowed size of the corpus block
+            
+        Returns:
+            Dictionary of chain type to prompt template
+        """
+        corpus_text = '\n\n'.join(
+            f"[{doc.metadata.get('doc_type', 'document')}]\n{doc.page_content}" for doc in corpus
         )
+        
+        corpus_tokens = len(tiktoken.get_encoding("cl100k_base").encode(corpus_text))
+        if corpus_tokens > max_corpus_tokens:
+            raise ValueError(
+                f"Corpus has {corpus_tokens} tokens, more than the {max_corpus_tokens} "
+                f"allowed in CAG mode. Use retrieval mode instead."
+            )
+        
+        # The corpus is passed as a partial variable so braces inside card text
+        # are not parsed as template fields
+        return {
+            chain_type: PromptTemplate(
+                template=SHARED_INSTRUCTIONS + CAG_CORPUS_HEADER + "{corpus}\n" + instructions + CAG_TAIL,
+                input_variables=["context", "question"],
+                partial_variables={"corpus": corpus_text}
+            )
+            for chain_type, instructions in cls._INSTRUCTIONS.items()
+        }
+    
+    def with_retriever(self, retriever) -> 'PrimalTCGQAChain':
+        """
+        Create a copy of this QA system that retrieves with a different retriever.
+        
+        The LLM, embeddings and compiled prompts are shared with the original;
+        only the retrieval chains are rebuilt (lazily, as for any instance). The copy gets its own in-memory
+        semantic cache since answers depend on the retriever, and its own
+        question embedding LRU so evictions in one never affect the other.
+        
+        Args:
+            retriever: Langchain retriever for the copy
+            
+        Returns:
+            New PrimalTCGQAChain bound to the given retriever
+            
+        Raises:
+            ValueError: In 'cag' mode, which never retrieves
+        """
+        if self.retrieval_mode == 'cag':
+            raise ValueError("CAG mode does not use a retriever; create a retrieval-mode chain instead.")
+        
+        clone = copy.copy(self)
+        clone.retriever = retriever
+        if self.cache is not None:
+            clone.cache = SemanticCache(threshold=self.cache.threshold,
+                                        ttl_seconds=self.cache.ttl_seconds,
+                                        max_entries=self.cache_max_entries)
+        clone._question_embeddings = OrderedDict(self._question_embeddings)
+        clone.chains = {}
+        return clone
     
     def detect_query_type(self, query: str) -> str:
         """Detect query type to route to appropriate chain"""
-        query_lower = query.lower()
-        
-        if any(word in query_lower for word in ['deck', 'build', 'synergy', 'combo', 'works with']):
-            return 'deck_building'
-        elif any(word in query_lower for word in ['show', 'list', 'find', 'search', 'all cards']):
-            return 'card_search'
-        elif any(word in query_lower for word in ['rule', 'how', 'when', 'trigger', 'phase', 'can i']):
-            return 'rules'
-        elif any(word in query_lower for word in ['compare', 'versus', 'vs', 'better', 'difference']):
-            return 'comparison'
-        else:
-            return 'general'
+        return _classify_query(query.lower())
     
     def query(self, question: str, chain_type: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -201,20 +468,160 @@ Answer:""",
             
         Returns:
             Dictionary with 'result' and 'source_documents'
+            ('cache_hit' is set when the answer came from the semantic cache)
         """
         # Detect chain type if not specified
         if not chain_type:
             chain_type = self.detect_query_type(question)
         
+        # Reuse the answer of a near-duplicate question
+        query_embedding = None
+        if self.cache is not None:
+            query_embedding = self._embed_question(question)
+            cached = self._from_cache(question, chain_type, query_embedding)
+            if cached is not None:
+                return cached
+        
         # Get the appropriate chain
-        chain = self.chains.get(chain_type, self.chains['general'])
+        chain = self._get_chain(chain_type)
         
         # Execute query
         result = chain({"query": question})
         
+        return self._store_result(result, chain_type, query_embedding)
+    
+    async def astream(self, question: str, chain_type: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the answer to a query as it is generated.
+        
+        Args:
+            question: The user's question
+            chain_type: Optional chain type override
+            
+        Yields:
+            {'result': token} chunks while the answer is generated, then one
+            final chunk with 'source_documents' and 'chain_type'
+        """
+        if not chain_type:
+            chain_type = self.detect_query_type(question)
+        
+        query_embedding = None
+        if self.cache is not None:
+            query_embedding = await self._aembed_question(question)
+            cached = self._from_cache(question, chain_type, query_embedding)
+            if cached is not None:
+                yield {'result': cached['result']}
+                yield {
+                    'source_documents': cached.get('source_documents', []),
+                    'chain_type': chain_type,
+                    'cache_hit': True
+                }
+                return
+        
+        chain = self._get_chain(chain_type)
+        
+        # Legacy chains only emit their final output from astream(), so take
+        # the LLM tokens from the event stream instead
+        result = None
+        async for event in chain.astream_events({"query": question}, version="v2"):
+            if event['event'] == 'on_chat_model_stream':
+                token = event['data']['chunk'].content
+                if token:
+                    yield {'result': token}
+            elif event['event'] == 'on_chain_end' and not event['parent_ids']:
+                result = event['data']['output']
+        
+        result = self._store_result(result, chain_type, query_embedding)
+        yield {
+            'source_documents': result.get('source_documents', []),
+            'chain_type': chain_type
+        }
+    
+    def query_many(self,
+                   questions: List[str],
+                   chain_types: Optional[List[Optional[str]]] = None,
+                   max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Execute several independent queries with batched chain calls.
+        
+        Questions are routed like query(), grouped by chain type and sent
+        through each chain's batch() so the LLM requests run concurrently.
+        
+        Args:
+            questions: The user's questions
+            chain_types: Optional chain type override per question
+            max_concurrency: Maximum number of parallel requests per chain
+            
+        Returns:
+            Result dictionaries in the same order as the questions
+        """
+        chain_types = [
+            chain_type or self.detect_query_type(question)
+            for question, chain_type in zip(questions, chain_types or [None] * len(questions))
+        ]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        
+        # One embedding request for the whole batch, then answer what we can from cache
+        embeddings = [None] * len(questions)
+        if self.cache is not None:
+            embeddings = self.embeddings.embed_documents(questions)
+            for i, (question, chain_type) in enumerate(zip(questions, chain_types)):
+                results[i] = self._from_cache(question, chain_type, embeddings[i])
+        
+        # Group the remaining questions by chain type
+        pending: Dict[str, List[int]] = {}
+        for i, chain_type in enumerate(chain_types):
+            if results[i] is None:
+                pending.setdefault(chain_type, []).append(i)
+        
+        for chain_type, indices in pending.items():
+            chain = self._get_chain(chain_type)
+            outputs = chain.batch(
+                [{"query": questions[i]} for i in indices],
+                config={"max_concurrency": max_concurrency}
+            )
+            for i, result in zip(indices, outputs):
+                results[i] = self._store_result(result, chain_type, embeddings[i])
+        
+        return results
+    
+    def _embed_question(self, question: str) -> List[float]:
+        """Embed a question for the semantic cache, reusing the embedding of an exact repeat"""
+        embedding = self._question_embeddings.get(question)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(question)
+        return self._remember_embedding(question, embedding)
+    
+    async def _aembed_question(self, question: str) -> List[float]:
+        """Async version of _embed_question()"""
+        embedding = self._question_embeddings.get(question)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(question)
+        return self._remember_embedding(question, embedding)
+    
+    def _remember_embedding(self, question: str, embedding: List[float]) -> List[float]:
+        """Mark a question's embedding as most recently used, evicting the oldest over the limit"""
+        self._question_embeddings[question] = embedding
+        self._question_embeddings.move_to_end(question)
+        if self.cache_max_entries is not None and len(self._question_embeddings) > self.cache_max_entries:
+            self._question_embeddings.popitem(last=False)
+        return embedding
+    
+    def _from_cache(self, question: str, chain_type: str, query_embedding) -> Optional[Dict[str, Any]]:
+        """Return the cached result of a near-duplicate question, if any"""
+        cached = self.cache.lookup(query_embedding, namespace=chain_type)
+        if cached is None:
+            return None
+        return {**cached, 'query': question, 'cache_hit': True}
+    
+    def _store_result(self, result: Dict[str, Any], chain_type: str, query_embedding) -> Dict[str, Any]:
+        """Tag a fresh result with its chain type and add it to the cache"""
         # Add metadata about chain type used
         result['chain_type'] = chain_type
         
+        if self.cache is not None:
+            self.cache.add(query_embedding, result, namespace=chain_type)
+        
         return result
     
     def format_response(self, result: Dict[str, Any]) -> str:
@@ -227,23 +634,24 @@ Answer:""",
         Returns:
             Formatted string response
         """
-        response = f"**Answer:**\n{result['result']}\n\n"
+        parts = [f"**Answer:**\n{result['result']}\n\n"]
         
-        if 'source_documents' in result and result['source_documents']:
-            response += "**Sources:**\n"
+        if result.get('source_documents'):
+            parts.append("**Sources:**\n")
             for i, doc in enumerate(result['source_documents'][:3], 1):
-                source_type = doc.metadata.get('doc_type', 'unknown')
+                metadata = doc.metadata
+                source_type = metadata.get('doc_type', 'unknown')
                 if source_type == 'card':
-                    card_name = doc.page_content.split('\n')[0].replace('Card Name: ', '')
-                    response += f"{i}. Card: {card_name}\n"
+                    card_name = doc.page_content.partition('\n')[0].removeprefix('Card Name: ')
+                    parts.append(f"{i}. Card: {card_name}\n")
                 elif source_type == 'rules':
-                    response += f"{i}. Rules Section {doc.metadata.get('section_index', 'N/A')}\n"
+                    parts.append(f"{i}. Rules Section {metadata.get('section_index', 'N/A')}\n")
                 elif source_type == 'deck_overview':
-                    response += f"{i}. Deck: {doc.metadata.get('deck_name', 'Unknown')}\n"
+                    parts.append(f"{i}. Deck: {metadata.get('deck_name', 'Unknown')}\n")
                 else:
-                    response += f"{i}. {source_type.title()}\n"
+                    parts.append(f"{i}. {source_type.title()}\n")
         
-        return response
+        return ''.join(parts)
 
 
 class ConversationalQAChain:
@@ -252,14 +660,26 @@ class ConversationalQAChain:
     Useful for iterative deck building sessions.
     """
     
-    def __init__(self, retriever, llm=None, verbose: bool = False):
-        """Initialize conversational chain with memory"""
+    def __init__(self, retriever, llm=None, verbose: bool = False, max_history_tokens: int = 512):
+        """
+        Initialize conversational chain with memory.
+        
+        Args:
+            retriever: Langchain retriever
+            llm: Language model (defaults to ChatOpenAI)
+            verbose: Enable verbose output
+            max_history_tokens: Token budget for verbatim history; older turns
+                are folded into a running summary
+        """
         self.retriever = retriever
         self.llm = llm or ChatOpenAI(temperature=0.3, model="gpt-3.5-turbo")
         self.verbose = verbose
         
-        # Initialize memory
-        self.memory = ConversationBufferMemory(
+        # Initialize memory: recent turns verbatim, older turns summarized,
+        # so the prompt stays bounded instead of growing every turn
+        self.memory = ConversationSummaryBufferMemory(
+            llm=ChatOpenAI(temperature=0, model="gpt-3.5-turbo"),
+            max_token_limit=max_history_tokens,
             memory_key="chat_history",
             return_messages=True,
             output_key="answer"
@@ -284,5 +704,9 @@ class ConversationalQAChain:
         self.memory.clear()
     
     def get_conversation_history(self) -> List[tuple]:
-        """Get the conversation history"""
-        return self.memory.chat_memory.messages
\ No newline at end of file
+        """Get the recent (not yet summarized) conversation history"""
+        return self.memory.chat_memory.messages
+    
+    def get_conversation_summary(self) -> str:
+        """Get the running summary of older turns"""
+        return self.memory.moving_summary_buffer
\ No newline at end of file
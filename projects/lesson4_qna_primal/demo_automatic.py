@@ -3,8 +3,10 @@ Automatic Demo for Primal TCG Q&A System
 Demonstrates all Q&A capabilities without user input
 """
 
+import asyncio
 import os
 import sys
+import threading
 import time
 from colorama import init, Fore, Style
 from dotenv import load_dotenv
@@ -15,10 +17,18 @@ load_dotenv()
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Local caches (embeddings, vector store) that survive between runs
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
 from loaders.document_loader import PrimalTCGDocumentLoader
-from retrievers.vector_store import PrimalTCGVectorStore, SmartRetriever
-from chains.qa_chain import PrimalTCGQAChain, ConversationalQAChain
+from retrievers.vector_store import PrimalTCGVectorStore, SmartRetriever, TruncatingRetriever
+from chains.qa_chain import PrimalTCGQAChain, ConversationalQAChain, create_shared_llm
 from utils.formatters import ResponseFormatter
+from utils.embedding_cache import PrecomputedQueryEmbeddings
+from demo_queries import (
+    BASIC_RETRIEVAL_QUERY, QA_TEST_CASES, RETRIEVAL_STRATEGY_QUERY,
+    CONVERSATION, COMPREHENSIVE_QUERY, COMPARISON_QUERY
+)
 
 # Initialize colorama
 init(autoreset=True)
@@ -42,6 +52,11 @@ def pause(seconds: float = 2):
     time.sleep(seconds)
 
 
+async def gather_all(*awaitables):
+    """Run independent awaitables concurrently and return results in order"""
+    return await asyncio.gather(*awaitables)
+
+
 class AutomaticQADemo:
     def __init__(self):
         print_section("🎮 PRIMAL TCG Q&A SYSTEM - AUTOMATIC DEMONSTRATION 🎮", Fore.MAGENTA)
@@ -52,7 +67,19 @@ class AutomaticQADemo:
         # Initialize components
         print(f"{Fore.YELLOW}Initializing Q&A System...")
         self.loader = PrimalTCGDocumentLoader()
-        self.vector_store = PrimalTCGVectorStore(use_chroma=False)
+        self.vector_store = PrimalTCGVectorStore(
+            use_chroma=False,
+            cache_dir=os.path.join(CACHE_DIR, 'vectorstore'),
+            embedding_cache_dir=os.path.join(CACHE_DIR, 'emb')
+        )
+        
+        # The demo queries are fixed, so embed them once and reuse across runs
+        # (each demo's queries are loaded by _prefetch before it starts)
+        self.vector_store.embeddings = PrecomputedQueryEmbeddings(
+            self.vector_store.embeddings,
+            os.path.join(CACHE_DIR, 'demo_embeddings.npz'),
+            model=self.vector_store.embedding_model
+        )
         self.formatter = ResponseFormatter()
         
         # Load and process documents
@@ -75,16 +102,28 @@ class AutomaticQADemo:
         self.vector_store.create_vectorstore(documents)
         
         # Initialize QA chains
-        retriever = self.vector_store.get_retriever(search_kwargs={"k": 4})
-        self.qa_chain = PrimalTCGQAChain(retriever, verbose=False)
-        self.conversational_chain = ConversationalQAChain(retriever, verbose=False)
+        # Retrieved documents are trimmed to a token budget before stuffing
+        retriever = TruncatingRetriever(
+            base_retriever=self.vector_store.get_retriever(search_kwargs={"k": 4}),
+            max_tokens_per_doc=256
+        )
+        # One LLM (and HTTP connection pool) shared by both chains
+        shared_llm = create_shared_llm()
+        self.qa_chain = PrimalTCGQAChain(
+            retriever,
+            llm=shared_llm,
+            verbose=False,
+            embeddings=self.vector_store.embeddings,
+            redis_url=os.getenv("REDIS_URL")
+        )
+        self.conversational_chain = ConversationalQAChain(retriever, llm=shared_llm, verbose=False)
     
     def demo_1_basic_retrieval(self):
         """Demonstrate basic document retrieval and similarity search"""
         print_section("DEMO 1: Basic Document Retrieval", Fore.GREEN)
         print(f"{Fore.WHITE}Demonstrating similarity search with embeddings (from lesson)\n")
         
-        query = "Show me cards with TRIGGER abilities"
+        query = BASIC_RETRIEVAL_QUERY
         print(f"{Fore.CYAN}Query: {query}")
         print(f"{Fore.WHITE}Performing similarity search...\n")
         
@@ -104,36 +143,20 @@ class AutomaticQADemo:
         print_section("DEMO 2: RetrievalQA Chain Types", Fore.GREEN)
         print(f"{Fore.WHITE}Showing different chain types for various query types\n")
         
-        test_cases = [
-            {
-                'type': 'Deck Building',
-                'query': 'What cards work well with Synthetic Laboratory field card?',
-                'chain_type': 'deck_building'
-            },
-            {
-                'type': 'Card Search',
-                'query': 'List all Fire element cards with cost 2 or less',
-                'chain_type': 'card_search'
-            },
-            {
-                'type': 'Rules Clarification',
-                'query': 'How does TRIGGER ability timing work?',
-                'chain_type': 'rules'
-            },
-            {
-                'type': 'Comparison',
-                'query': 'Compare TRIGGER vs ACTIVATE abilities for deck building',
-                'chain_type': 'comparison'
-            }
-        ]
+        test_cases = QA_TEST_CASES
+        
+        # The four questions are independent, so send them as batched chain calls
+        print(f"{Fore.YELLOW}Running {len(test_cases)} queries concurrently...\n")
+        results = self.qa_chain.query_many(
+            [test['query'] for test in test_cases],
+            chain_types=[test['chain_type'] for test in test_cases]
+        )
         
-        for test in test_cases:
+        for test, result in zip(test_cases, results):
             print_subsection(f"{test['type']} Query")
             print(f"{Fore.CYAN}Question: {test['query']}")
             print(f"{Fore.YELLOW}Using chain type: {test['chain_type']}\n")
             
-            result = self.qa_chain.query(test['query'], chain_type=test['chain_type'])
-            
             print(f"{Fore.GREEN}Answer:")
             # Show first 400 chars of answer
             answer_preview = result['result'][:400] + "..." if len(result['result']) > 400 else result['result']
@@ -149,12 +172,18 @@ class AutomaticQADemo:
         print_section("DEMO 3: Advanced Retrieval Strategies", Fore.GREEN)
         print(f"{Fore.WHITE}Comparing similarity, MMR, and hybrid search\n")
         
-        query = "Build a competitive Fire/Air aggro deck"
+        query = RETRIEVAL_STRATEGY_QUERY
         print(f"{Fore.CYAN}Query: {query}\n")
         
+        # The three strategies are independent, so retrieve concurrently
+        sim_docs, mmr_docs, hybrid_docs = asyncio.run(gather_all(
+            asyncio.to_thread(self.vector_store.similarity_search, query, k=3),
+            asyncio.to_thread(self.vector_store.mmr_search, query, k=3, lambda_mult=0.5),
+            asyncio.to_thread(self.vector_store.hybrid_search, query, k=4)
+        ))
+        
         # 1. Similarity Search
         print_subsection("Similarity Search (Standard)")
-        sim_docs = self.vector_store.similarity_search(query, k=3)
         print(f"{Fore.WHITE}Retrieved {len(sim_docs)} documents:")
         for doc in sim_docs:
             print(f"  • {doc.metadata.get('doc_type', 'unknown')}: {doc.page_content[:80]}...")
@@ -162,7 +191,6 @@ class AutomaticQADemo:
         # 2. MMR Search
         print_subsection("MMR Search (Maximum Marginal Relevance)")
         print(f"{Fore.WHITE}Balances relevance with diversity")
-        mmr_docs = self.vector_store.mmr_search(query, k=3, lambda_mult=0.5)
         print(f"Retrieved {len(mmr_docs)} diverse documents:")
         for doc in mmr_docs:
             print(f"  • {doc.metadata.get('doc_type', 'unknown')}: {doc.page_content[:80]}...")
@@ -170,7 +198,6 @@ class AutomaticQADemo:
         # 3. Hybrid Search
         print_subsection("Hybrid Search (Multi-source)")
         print(f"{Fore.WHITE}Combines cards, rules, and deck documents")
-        hybrid_docs = self.vector_store.hybrid_search(query, k=4)
         print(f"Retrieved {len(hybrid_docs)} documents from multiple sources:")
         for doc in hybrid_docs:
             print(f"  • {doc.metadata.get('doc_type', 'unknown')}: {doc.page_content[:80]}...")
@@ -182,12 +209,7 @@ class AutomaticQADemo:
         print_section("DEMO 4: Conversational Q&A with Memory", Fore.GREEN)
         print(f"{Fore.WHITE}Multi-turn conversation for iterative deck building\n")
         
-        conversation = [
-            "I want to build a deck around TRIGGER abilities",
-            "What elements work best with TRIGGER strategies?",
-            "Can you suggest specific cards for a Fire TRIGGER deck?",
-            "How many TRIGGER cards should I include in a 40-card deck?"
-        ]
+        conversation = CONVERSATION
         
         print(f"{Fore.YELLOW}Starting deck building conversation...\n")
         
@@ -258,24 +280,37 @@ class AutomaticQADemo:
         
         pause(3)
     
+    async def _stream_answer(self, query: str, chain_type: str) -> dict:
+        """Print an answer as it streams in and return the complete result"""
+        answer = []
+        result = {}
+        sys.stdout.write(Fore.WHITE)
+        async for chunk in self.qa_chain.astream(query, chain_type=chain_type):
+            if 'result' in chunk:
+                answer.append(chunk['result'])
+                sys.stdout.write(chunk['result'])
+                sys.stdout.flush()
+            else:
+                result.update(chunk)
+        print(Style.RESET_ALL)
+        
+        result['result'] = ''.join(answer)
+        return result
+    
     def demo_6_comprehensive_query(self):
         """Demonstrate a comprehensive deck building query"""
         print_section("DEMO 6: Comprehensive Deck Building Query", Fore.GREEN)
         print(f"{Fore.WHITE}Complex query using all system capabilities\n")
         
-        query = """Build a competitive Synthetic Laboratory deck focusing on 
-        Synthetic Life creatures with TRIGGER abilities. Include mana curve 
-        recommendations and key synergies."""
+        query = COMPREHENSIVE_QUERY
         
         print(f"{Fore.CYAN}Complex Query:")
         print(f"{Fore.WHITE}{query}\n")
         
         print(f"{Fore.YELLOW}Processing with deck_building chain...\n")
         
-        result = self.qa_chain.query(query, chain_type='deck_building')
-        
         print(f"{Fore.GREEN}Comprehensive Answer:")
-        print(f"{Fore.WHITE}{result['result'][:800]}...")
+        result = asyncio.run(self._stream_answer(query, chain_type='deck_building'))
         
         if result.get('source_documents'):
             print(f"\n{Fore.YELLOW}Information synthesized from {len(result['source_documents'])} sources:")
@@ -290,7 +325,7 @@ class AutomaticQADemo:
         print_section("DEMO 7: Approach Comparison", Fore.GREEN)
         print(f"{Fore.WHITE}Comparing basic vs advanced retrieval for deck building\n")
         
-        query = "What are good Fire element cards for aggro?"
+        query = COMPARISON_QUERY
         
         print_subsection("Basic Approach (Lesson 4 Default)")
         print(f"{Fore.WHITE}Simple similarity search + basic QA chain")
@@ -300,7 +335,7 @@ class AutomaticQADemo:
             search_type="similarity",
             search_kwargs={"k": 2}
         )
-        basic_chain = PrimalTCGQAChain(basic_retriever, verbose=False)
+        basic_chain = self.qa_chain.with_retriever(basic_retriever)
         
         start_time = time.time()
         basic_result = basic_chain.query(query, chain_type='general')
@@ -353,34 +388,50 @@ class AutomaticQADemo:
         print(f"{Fore.MAGENTA}Thank you for watching the Primal TCG Q&A demonstration!")
         print(f"{Fore.MAGENTA}{'='*70}")
     
+    def _prefetch(self, queries):
+        """Embed a demo's queries and warm the vector store before the demo runs"""
+        if not queries:
+            return
+        self.vector_store.embeddings.preload(queries)
+        for query in queries:
+            self.vector_store.similarity_search(query, k=1)
+    
+    def _start_prefetch(self, queries) -> threading.Thread:
+        """Run _prefetch in a daemon thread, so Ctrl+C never waits for it"""
+        def prefetch():
+            try:
+                self._prefetch(queries)
+            except Exception as e:
+                print(f"{Fore.RED}Warning: could not prepare demo queries: {e}")
+        
+        thread = threading.Thread(target=prefetch, daemon=True)
+        thread.start()
+        return thread
+    
     def run(self):
         """Run the complete automatic demonstration"""
+        steps = [
+            (self.demo_1_basic_retrieval, [BASIC_RETRIEVAL_QUERY]),
+            (self.demo_2_qa_chain_types, [test['query'] for test in QA_TEST_CASES]),
+            (self.demo_3_retrieval_strategies, [RETRIEVAL_STRATEGY_QUERY]),
+            (self.demo_4_conversational_qa, CONVERSATION),
+            (self.demo_5_document_processing, []),
+            (self.demo_6_comprehensive_query, [COMPREHENSIVE_QUERY]),
+            (self.demo_7_performance_comparison, [COMPARISON_QUERY]),
+        ]
+        
         try:
             print(f"{Fore.YELLOW}Starting automatic demonstration...\n")
-            pause(2)
-            
-            # Run each demo
-            self.demo_1_basic_retrieval()
-            pause(2)
             
-            self.demo_2_qa_chain_types()
-            pause(2)
-            
-            self.demo_3_retrieval_strategies()
-            pause(2)
-            
-            self.demo_4_conversational_qa()
-            pause(2)
+            # Each demo runs on the main thread; only the warmup of its
+            # embeddings/retrieval overlaps the pause before it
+            for demo, queries in steps:
+                prefetch = self._start_prefetch(queries)
+                pause(2)
+                prefetch.join()
+                demo()
             
-            self.demo_5_document_processing()
             pause(2)
-            
-            self.demo_6_comprehensive_query()
-            pause(2)
-            
-            self.demo_7_performance_comparison()
-            pause(2)
-            
             self.run_summary()
             
         except KeyboardInterrupt:
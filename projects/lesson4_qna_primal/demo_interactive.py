@@ -5,6 +5,9 @@ Demonstrates RetrievalQA with multiple retrieval strategies
 
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from colorama import init, Fore, Style
 from dotenv import load_dotenv
 
@@ -14,9 +17,12 @@ load_dotenv()
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Local caches (embeddings, vector store) that survive between runs
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
 from loaders.document_loader import PrimalTCGDocumentLoader
-from retrievers.vector_store import PrimalTCGVectorStore, SmartRetriever
-from chains.qa_chain import PrimalTCGQAChain, ConversationalQAChain
+from retrievers.vector_store import PrimalTCGVectorStore, SmartRetriever, TruncatingRetriever
+from utils.embedding_cache import PrecomputedQueryEmbeddings
 from utils.formatters import ResponseFormatter
 
 # Initialize colorama
@@ -32,10 +38,10 @@ class InteractiveQADemo:
         # Initialize components
         self.loader = None
         self.vector_store = None
-        self.qa_chain = None
-        self.conversational_chain = None
         self.formatter = ResponseFormatter()
         self.documents = []
+        # Serializes background embedding prefetches (they share one cache file)
+        self._prefetch_lock = threading.Lock()
         
         # Initialize system
         self._initialize_system()
@@ -52,32 +58,92 @@ class InteractiveQADemo:
         
         # Create vector store
         print(f"{Fore.WHITE}Creating vector store...")
-        self.vector_store = PrimalTCGVectorStore(use_chroma=False)
+        self.vector_store = PrimalTCGVectorStore(
+            use_chroma=False,
+            cache_dir=os.path.join(CACHE_DIR, 'vectorstore'),
+            embedding_cache_dir=os.path.join(CACHE_DIR, 'emb')
+        )
+        # Sample queries are embedded in the background while the user types
+        # (see _prefetch_embeddings); typing one verbatim skips the embedding call
+        self.vector_store.embeddings = PrecomputedQueryEmbeddings(
+            self.vector_store.embeddings,
+            os.path.join(CACHE_DIR, 'interactive_embeddings.npz'),
+            model=self.vector_store.embedding_model
+        )
         self.vector_store.create_vectorstore(self.documents)
         print(f"{Fore.GREEN}✓ Vector store ready")
         
-        # Initialize QA chains
-        print(f"{Fore.WHITE}Initializing QA chains...")
-        retriever = self.vector_store.get_retriever(search_kwargs={"k": 4})
-        self.qa_chain = PrimalTCGQAChain(retriever, verbose=False)
-        self.conversational_chain = ConversationalQAChain(retriever, verbose=False)
-        print(f"{Fore.GREEN}✓ QA chains ready\n")
+        print(f"{Fore.GREEN}✓ QA chains will be created on first use\n")
+    
+    @cached_property
+    def _retriever(self):
+        """Retriever shared by both chains; documents are trimmed to a token budget before stuffing"""
+        return TruncatingRetriever(
+            base_retriever=self.vector_store.get_retriever(search_kwargs={"k": 4}),
+            max_tokens_per_doc=256
+        )
+    
+    @cached_property
+    def _shared_llm(self):
+        """One LLM (and HTTP connection pool) shared by both chains"""
+        from chains.qa_chain import create_shared_llm
+        return create_shared_llm()
+    
+    @cached_property
+    def qa_chain(self):
+        """QA chain, built the first time a single-question mode is used"""
+        from chains.qa_chain import PrimalTCGQAChain
+        
+        print(f"{Fore.WHITE}Initializing QA chain...")
+        return PrimalTCGQAChain(
+            self._retriever,
+            llm=self._shared_llm,
+            verbose=False,
+            embeddings=self.vector_store.embeddings,
+            # Menu sessions repeat the sample queries; only reuse near-identical ones
+            cache_threshold=0.97,
+            redis_url=os.getenv("REDIS_URL")
+        )
+    
+    @cached_property
+    def conversational_chain(self):
+        """Conversational chain, built the first time conversational mode is used"""
+        from chains.qa_chain import ConversationalQAChain
+        
+        print(f"{Fore.WHITE}Initializing conversational chain...")
+        return ConversationalQAChain(self._retriever, llm=self._shared_llm, verbose=False)
+    
+    # The menu never changes, so it is rendered once and written with a single call
+    MENU = '\n'.join([
+        f"\n{Fore.CYAN}{'='*60}",
+        f"{Fore.CYAN}MAIN MENU - Choose Query Type:",
+        f"{Fore.CYAN}{'='*60}",
+        f"{Fore.WHITE}1. {Fore.GREEN}Deck Building Assistance{Fore.WHITE} - Get help building decks",
+        f"{Fore.WHITE}2. {Fore.GREEN}Card Search{Fore.WHITE} - Find specific cards",
+        f"{Fore.WHITE}3. {Fore.GREEN}Rules Clarification{Fore.WHITE} - Get rules explanations",
+        f"{Fore.WHITE}4. {Fore.GREEN}Card Comparison{Fore.WHITE} - Compare cards or strategies",
+        f"{Fore.WHITE}5. {Fore.GREEN}Free Query{Fore.WHITE} - Ask anything (auto-detect type)",
+        f"{Fore.WHITE}6. {Fore.GREEN}Conversational Mode{Fore.WHITE} - Multi-turn deck building session",
+        f"{Fore.WHITE}7. {Fore.YELLOW}Test Retrieval Strategies{Fore.WHITE} - Compare different retrievers",
+        f"{Fore.WHITE}8. {Fore.YELLOW}View Sample Queries{Fore.WHITE} - See example questions",
+        f"{Fore.WHITE}0. {Fore.RED}Exit",
+        f"{Fore.CYAN}{'='*60}",
+    ]) + '\n'
+    
+    def _prefetch_embeddings(self, queries):
+        """Embed likely queries on a background thread while the user is typing"""
+        def preload():
+            with self._prefetch_lock:
+                try:
+                    self.vector_store.embeddings.preload(queries)
+                except Exception as e:
+                    print(f"{Fore.RED}Warning: could not prefetch query embeddings: {e}")
+        
+        threading.Thread(target=preload, daemon=True).start()
     
     def display_menu(self):
         """Display the main menu"""
-        print(f"\n{Fore.CYAN}{'='*60}")
-        print(f"{Fore.CYAN}MAIN MENU - Choose Query Type:")
-        print(f"{Fore.CYAN}{'='*60}")
-        print(f"{Fore.WHITE}1. {Fore.GREEN}Deck Building Assistance{Fore.WHITE} - Get help building decks")
-        print(f"{Fore.WHITE}2. {Fore.GREEN}Card Search{Fore.WHITE} - Find specific cards")
-        print(f"{Fore.WHITE}3. {Fore.GREEN}Rules Clarification{Fore.WHITE} - Get rules explanations")
-        print(f"{Fore.WHITE}4. {Fore.GREEN}Card Comparison{Fore.WHITE} - Compare cards or strategies")
-        print(f"{Fore.WHITE}5. {Fore.GREEN}Free Query{Fore.WHITE} - Ask anything (auto-detect type)")
-        print(f"{Fore.WHITE}6. {Fore.GREEN}Conversational Mode{Fore.WHITE} - Multi-turn deck building session")
-        print(f"{Fore.WHITE}7. {Fore.YELLOW}Test Retrieval Strategies{Fore.WHITE} - Compare different retrievers")
-        print(f"{Fore.WHITE}8. {Fore.YELLOW}View Sample Queries{Fore.WHITE} - See example questions")
-        print(f"{Fore.WHITE}0. {Fore.RED}Exit")
-        print(f"{Fore.CYAN}{'='*60}")
+        sys.stdout.write(self.MENU)
     
     def deck_building_mode(self):
         """Deck building assistance mode"""
@@ -94,6 +160,7 @@ class InteractiveQADemo:
         print(f"{Fore.YELLOW}Sample queries:")
         for q in sample_queries:
             print(f"  - {q}")
+        self._prefetch_embeddings(sample_queries)
         
         query = input(f"\n{Fore.CYAN}Your deck building question: ").strip()
         if not query:
@@ -123,6 +190,7 @@ class InteractiveQADemo:
         print(f"{Fore.YELLOW}Sample queries:")
         for q in sample_queries:
             print(f"  - {q}")
+        self._prefetch_embeddings(sample_queries)
         
         query = input(f"\n{Fore.CYAN}Your card search: ").strip()
         if not query:
@@ -149,6 +217,7 @@ class InteractiveQADemo:
         print(f"{Fore.YELLOW}Sample queries:")
         for q in sample_queries:
             print(f"  - {q}")
+        self._prefetch_embeddings(sample_queries)
         
         query = input(f"\n{Fore.CYAN}Your rules question: ").strip()
         if not query:
@@ -175,6 +244,7 @@ class InteractiveQADemo:
         print(f"{Fore.YELLOW}Sample queries:")
         for q in sample_queries:
             print(f"  - {q}")
+        self._prefetch_embeddings(sample_queries)
         
         query = input(f"\n{Fore.CYAN}What would you like to compare? ").strip()
         if not query:
@@ -200,7 +270,7 @@ class InteractiveQADemo:
         print(f"\n{Fore.YELLOW}Detected query type: {query_type}")
         print(f"{Fore.YELLOW}Processing...")
         
-        result = self.qa_chain.query(query)
+        result = self.qa_chain.query(query, chain_type=query_type)
         
         print(f"\n{Fore.GREEN}Answer:")
         print(f"{Fore.WHITE}{result['result']}")
@@ -213,6 +283,19 @@ class InteractiveQADemo:
         print(f"\n{Fore.GREEN}CONVERSATIONAL MODE")
         print(f"{Fore.WHITE}Have a conversation about deck building. Type 'clear' to reset or 'exit' to leave.\n")
         
+        # Only the opening question is retrieved verbatim; follow-ups are
+        # rephrased with the chat history before retrieval
+        sample_queries = [
+            "I want to build a deck around TRIGGER abilities",
+            "Help me build a Synthetic Laboratory deck",
+            "What is a good first deck for a new player?"
+        ]
+        
+        print(f"{Fore.YELLOW}Sample openers:")
+        for q in sample_queries:
+            print(f"  - {q}")
+        self._prefetch_embeddings(sample_queries)
+        
         while True:
             query = input(f"\n{Fore.CYAN}You: ").strip()
             
@@ -242,23 +325,30 @@ class InteractiveQADemo:
         
         print(f"\n{Fore.YELLOW}Testing retrieval strategies...\n")
         
+        # The three searches are independent (each waits on its own embedding
+        # request), so run them in parallel and print in a fixed order
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            sim_future = executor.submit(self.vector_store.similarity_search, query, k=4)
+            mmr_future = executor.submit(self.vector_store.mmr_search, query, k=4, lambda_mult=0.5)
+            hybrid_future = executor.submit(self.vector_store.hybrid_search, query, k=6)
+            sim_docs = sim_future.result()
+            mmr_docs = mmr_future.result()
+            hybrid_docs = hybrid_future.result()
+        
         # Test similarity search
         print(f"{Fore.CYAN}1. Similarity Search (k=4):")
-        sim_docs = self.vector_store.similarity_search(query, k=4)
         for i, doc in enumerate(sim_docs, 1):
             doc_type = doc.metadata.get('doc_type', 'unknown')
             print(f"  {i}. {doc_type}: {doc.page_content[:100]}...")
         
         # Test MMR search
         print(f"\n{Fore.CYAN}2. MMR Search (diversity-focused):")
-        mmr_docs = self.vector_store.mmr_search(query, k=4, lambda_mult=0.5)
         for i, doc in enumerate(mmr_docs, 1):
             doc_type = doc.metadata.get('doc_type', 'unknown')
             print(f"  {i}. {doc_type}: {doc.page_content[:100]}...")
         
         # Test hybrid search
         print(f"\n{Fore.CYAN}3. Hybrid Search (cards+rules+decks):")
-        hybrid_docs = self.vector_store.hybrid_search(query, k=6)
         for i, doc in enumerate(hybrid_docs, 1):
             doc_type = doc.metadata.get('doc_type', 'unknown')
             print(f"  {i}. {doc_type}: {doc.page_content[:100]}...")
@@ -0,0 +1,54 @@
+"""
+Literal queries used by the automatic demonstration
+Kept in one place so their embeddings can be computed once and cached on disk
+"""
+
+BASIC_RETRIEVAL_QUERY = "Show me cards with TRIGGER abilities"
+
+QA_TEST_CASES = [
+    {
+        'type': 'Deck Building',
+        'query': 'What cards work well with Synthetic Laboratory field card?',
+        'chain_type': 'deck_building'
+    },
+    {
+        'type': 'Card Search',
+        'query': 'List all Fire element cards with cost 2 or less',
+        'chain_type': 'card_search'
+    },
+    {
+        'type': 'Rules Clarification',
+        'query': 'How does TRIGGER ability timing work?',
+        'chain_type': 'rules'
+    },
+    {
+        'type': 'Comparison',
+        'query': 'Compare TRIGGER vs ACTIVATE abilities for deck building',
+        'chain_type': 'comparison'
+    }
+]
+
+RETRIEVAL_STRATEGY_QUERY = "Build a competitive Fire/Air aggro deck"
+
+CONVERSATION = [
+    "I want to build a deck around TRIGGER abilities",
+    "What elements work best with TRIGGER strategies?",
+    "Can you suggest specific cards for a Fire TRIGGER deck?",
+    "How many TRIGGER cards should I include in a 40-card deck?"
+]
+
+COMPREHENSIVE_QUERY = """Build a competitive Synthetic Laboratory deck focusing on 
+        Synthetic Life creatures with TRIGGER abilities. Include mana curve 
+        recommendations and key synergies."""
+
+COMPARISON_QUERY = "What are good Fire element cards for aggro?"
+
+# Every literal query above, in the order the demos use them
+DEMO_QUERIES = [
+    BASIC_RETRIEVAL_QUERY,
+    *(test['query'] for test in QA_TEST_CASES),
+    RETRIEVAL_STRATEGY_QUERY,
+    *CONVERSATION,
+    COMPREHENSIVE_QUERY,
+    COMPARISON_QUERY,
+]
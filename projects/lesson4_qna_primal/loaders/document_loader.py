@@ -3,14 +3,65 @@ Document Loader for Primal TCG Q&A System
 Loads and processes cards CSV, rules markdown, and deck JSON files
 """
 
+import hashlib
 import json
 import os
-from typing import List, Dict, Any
+import pickle
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Callable, List, Dict, Any
 from langchain_community.document_loaders import TextLoader, DataFrameLoader
 from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter, MarkdownTextSplitter
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+import numpy as np
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:  # Faster JSON parsing is optional
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # Columnar CSV parsing is optional
+    pa = None
+
+# Bump when the document construction changes so stale caches are ignored
+DOCUMENT_CACHE_VERSION = 4
+
+# Rules are chunked into overlapping windows that never cross a markdown header
+RULES_HEADER_RE = re.compile(r'^#{1,6} .*$', re.M)
+RULES_CHUNK_SIZE = 500
+RULES_CHUNK_OVERLAP = 100
+
+# Deck card groups, matched in order against the lowercased card type
+DECK_CARD_GROUPS = ('character', 'ability', 'field', 'strategy')
+
+# Card columns included in the searchable content, in order, with their labels
+ENHANCED_CARD_FIELDS = [
+    ('Name', 'Card Name'),
+    ('Card Type', 'Type'),
+    ('Elements', 'Elements'),
+    ('Cost', 'Cost'),
+    ('Attribute', 'Attribute/Skill'),
+    ('Effect', 'Effect'),
+    ('Healthy', 'Stats (Healthy)'),
+    ('Injured', 'Stats (Injured)'),
+    ('Rarity', 'Rarity'),
+    ('Card Set', 'Set'),
+]
+
+
+def _parse_int(value: str) -> int:
+    """Parse an integer field, defaulting to 0 when it is not a number"""
+    try:
+        return int(value)
+    except:
+        return 0
+
 
 class PrimalTCGDocumentLoader:
     """
@@ -57,43 +108,118 @@ class PrimalTCGDocumentLoader:
             print(f"Warning: Cards CSV not found at {csv_path}")
             return []
         
-        # Read CSV with pandas (supports multi-char delimiter)
-        df = pd.read_csv(csv_path, sep='\\|\\|', engine='python')
+        self.cards_docs.extend(self._load_cached(csv_path, 'cards', self._parse_cards))
         
-        # Limit to first 50 cards for demo purposes to avoid token limits
-        df = df.head(50)
+        print(f"Loaded {len(self.cards_docs)} card documents")
+        return self.cards_docs
+    
+    def _load_cached(self, path: str, kind: str, build: Callable[[str], List[Document]]) -> List[Document]:
+        """
+        Build documents from a source file, reusing a pickled result when the file is unchanged.
         
-        # Convert DataFrame rows to documents
-        for _, row in df.iterrows():
-            # Create content string from row data
-            content_lines = []
-            for col in df.columns:
-                if pd.notna(row[col]):
-                    content_lines.append(f"{col}: {row[col]}")
-            content = '\n'.join(content_lines)
-            
-            # Create enhanced content with searchable format
-            enhanced_content = self._enhance_card_content(content)
+        Args:
+            path: Source file
+            kind: Cache file prefix (e.g. 'cards')
+            build: Function that parses the file into documents
             
-            # Extract metadata for filtering
-            metadata = self._extract_card_metadata(content)
+        Returns:
+            List of documents
+        """
+        with open(path, 'rb') as f:
+            digest = hashlib.blake2b(f.read(), digest_size=8)
+        digest.update(str(DOCUMENT_CACHE_VERSION).encode())
+        cache_path = os.path.join(self.data_dir, '.cache', f"{kind}_{digest.hexdigest()}.pkl")
+        
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+            except Exception as e:
+                print(f"Warning: Ignoring unreadable cache {cache_path}: {e}")
+        
+        docs = build(path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            pickle.dump(docs, f, protocol=5)
+        return docs
+    
+    def _parse_cards(self, csv_path: str) -> List[Document]:
+        """Parse the cards CSV into one document per card"""
+        df = self._read_cards_csv(csv_path, limit=50)
+        
+        # Header names carry a leading space and values are compared stripped
+        df.columns = df.columns.str.strip()
+        df = df.apply(lambda column: column.str.strip())
+        
+        # Build searchable content and filter metadata column-wise for all cards
+        enhanced_content = self._enhance_card_content(df)
+        metadatas = self._extract_card_metadata(df)
+        
+        docs = []
+        for content, metadata in zip(enhanced_content, metadatas):
             metadata['source'] = 'card'
             metadata['doc_type'] = 'card'
-            
-            # Create new document with enhanced content and metadata
-            enhanced_doc = Document(
-                page_content=enhanced_content,
-                metadata=metadata
-            )
-            self.cards_docs.append(enhanced_doc)
+            docs.append(Document(page_content=content, metadata=metadata))
         
-        print(f"Loaded {len(self.cards_docs)} card documents")
-        return self.cards_docs
+        return docs
+    
+    @staticmethod
+    def _read_cards_csv(csv_path: str, limit: int = None) -> pd.DataFrame:
+        """
+        Read the '||'-delimited cards CSV into a DataFrame.
+        
+        Parses with pyarrow's multithreaded CSV reader when it is installed,
+        otherwise splits lines with str.split. Both match pandas' regex-separator
+        Python engine for this file: header names and values are kept verbatim
+        (including leading spaces and quotes) and empty fields become missing
+        values.
+        
+        Args:
+            csv_path: Path to cards.csv
+            limit: Only parse the first `limit` cards (demo keeps token usage low)
+        """
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        
+        if pa is not None:
+            try:
+                return PrimalTCGDocumentLoader._read_cards_arrow(text, limit)
+            except pa.ArrowInvalid as e:
+                print(f"Warning: pyarrow could not parse {csv_path}, using the line splitter: {e}")
+        
+        lines = [line for line in text.splitlines() if line.strip()]
+        
+        header = lines[0].split('||')
+        rows = [
+            [value if value else None for value in line.split('||')]
+            for line in lines[1:][:limit]
+        ]
+        return pd.DataFrame(rows, columns=header)
+    
+    @staticmethod
+    def _read_cards_arrow(text: str, limit: int = None) -> pd.DataFrame:
+        """Parse the cards CSV text with pyarrow.csv (every column read as a string)"""
+        # pyarrow needs a one-character delimiter; \x1f (unit separator) never occurs in card text
+        text = text.replace('||', '\x1f')
+        header = text.split('\n', 1)[0].rstrip('\r').split('\x1f')
+        
+        table = pacsv.read_csv(
+            pa.BufferReader(text.encode('utf-8')),
+            parse_options=pacsv.ParseOptions(delimiter='\x1f', quote_char=False, escape_char=False),
+            convert_options=pacsv.ConvertOptions(
+                column_types={name: pa.string() for name in header},
+                null_values=[''],
+                strings_can_be_null=True
+            )
+        )
+        if limit is not None:
+            table = table.slice(0, limit)
+        return table.to_pandas()
     
     def load_rules(self) -> List[Document]:
         """
         Load and split rules document for granular retrieval.
-        Uses MarkdownTextSplitter to preserve structure.
+        Chunks never cross a markdown header to preserve structure.
         """
         rules_path = os.path.join(self.data_dir, "rules.md")
         
@@ -101,25 +227,28 @@ class PrimalTCGDocumentLoader:
             print(f"Warning: Rules document not found at {rules_path}")
             return []
         
+        self.rules_docs.extend(self._load_cached(rules_path, 'rules', self._split_rules))
+        
+        print(f"Loaded {len(self.rules_docs)} rules document chunks")
+        return self.rules_docs
+    
+    def _split_rules(self, rules_path: str) -> List[Document]:
+        """Split the rules markdown into chunk documents"""
         # Load the markdown file
         with open(rules_path, 'r', encoding='utf-8') as f:
             rules_text = f.read()
         
-        # Split by sections for better context
-        splitter = MarkdownTextSplitter(
-            chunk_size=500,
-            chunk_overlap=100,
-            length_function=len
-        )
-        
-        # Create documents from splits
-        splits = splitter.split_text(rules_text)
-        
+        splits = []
         # Limit to first 100 chunks for demo purposes
-        splits = splits[:100]
-        
-        for i, split in enumerate(splits):
-            doc = Document(
+        for start, end in self._rules_windows(rules_text):
+            split = rules_text[start:end].strip()
+            if split:
+                splits.append(split)
+            if len(splits) == 100:
+                break
+        
+        return [
+            Document(
                 page_content=split,
                 metadata={
                     'source': 'rules',
@@ -128,10 +257,55 @@ class PrimalTCGDocumentLoader:
                     'total_sections': len(splits)
                 }
             )
-            self.rules_docs.append(doc)
+            for i, split in enumerate(splits)
+        ]
+    
+    @staticmethod
+    def _rules_windows(rules_text: str) -> np.ndarray:
+        """
+        Compute chunk boundaries for the rules text.
         
-        print(f"Loaded {len(self.rules_docs)} rules document chunks")
-        return self.rules_docs
+        Sections start at every markdown header; each section is cut into
+        RULES_CHUNK_SIZE windows overlapping by RULES_CHUNK_OVERLAP characters,
+        and no window crosses into the next section. Window edges are moved
+        back to the nearest preceding whitespace in the section so no word is
+        split; a word longer than RULES_CHUNK_OVERLAP may still be cut, and a
+        window may grow by up to RULES_CHUNK_OVERLAP to reach its section end.
+        
+        Args:
+            rules_text: Full rules markdown
+            
+        Returns:
+            Array of (start, end) character offsets, in document order
+        """
+        headers = np.fromiter((m.start() for m in RULES_HEADER_RE.finditer(rules_text)), dtype=np.int64)
+        section_starts = np.unique(np.concatenate(([0], headers)))
+        section_ends = np.append(section_starts[1:], len(rules_text))
+        
+        # Windows needed so the last one reaches the end of its section
+        step = RULES_CHUNK_SIZE - RULES_CHUNK_OVERLAP
+        overflow = np.maximum(section_ends - section_starts - RULES_CHUNK_SIZE, 0)
+        counts = 1 + -(-overflow // step)
+        
+        # Position of each window within its section
+        first_window = np.repeat(np.cumsum(counts) - counts, counts)
+        offsets = (np.arange(counts.sum()) - first_window) * step
+        
+        starts = np.repeat(section_starts, counts) + offsets
+        ends = np.minimum(starts + RULES_CHUNK_SIZE, np.repeat(section_ends, counts))
+        
+        # Word boundaries: just after any whitespace, plus the section edges
+        whitespace = np.fromiter((m.end() for m in re.finditer(r'\s', rules_text)), dtype=np.int64)
+        boundaries = np.unique(np.concatenate((whitespace, section_starts, section_ends)))
+        
+        # Section starts are boundaries, so a start never leaves its section;
+        # an edge stays put when no boundary is within RULES_CHUNK_OVERLAP
+        snapped_starts = boundaries[np.searchsorted(boundaries, starts, side='right') - 1]
+        starts = np.where(starts - snapped_starts <= RULES_CHUNK_OVERLAP, snapped_starts, starts)
+        snapped_ends = boundaries[np.searchsorted(boundaries, ends, side='right') - 1]
+        ends = np.where((ends - snapped_ends <= RULES_CHUNK_OVERLAP) & (snapped_ends > starts),
+                        snapped_ends, ends)
+        return np.column_stack((starts, ends))
     
     def load_decks(self) -> List[Document]:
         """
@@ -140,109 +314,105 @@ class PrimalTCGDocumentLoader:
         """
         deck_files = [f for f in os.listdir(self.data_dir) if f.endswith('.json')]
         
-        for deck_file in deck_files:
-            deck_path = os.path.join(self.data_dir, deck_file)
-            deck_name = deck_file.replace('.json', '')
-            
-            with open(deck_path, 'r', encoding='utf-8') as f:
-                deck_data = json.load(f)
-            
-            # Create deck overview document
-            overview_doc = self._create_deck_overview(deck_data, deck_name)
-            if overview_doc:
-                self.deck_docs.append(overview_doc)
-            
-            # Create detailed card list document
-            detail_doc = self._create_deck_details(deck_data, deck_name)
-            if detail_doc:
-                self.deck_docs.append(detail_doc)
+        # Deck files are read and parsed independently, so overlap them
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for docs in executor.map(self._load_one_deck, deck_files):
+                self.deck_docs.extend(docs)
         
         print(f"Loaded {len(self.deck_docs)} deck documents")
         return self.deck_docs
     
-    def _enhance_card_content(self, content: str) -> str:
+    def _load_one_deck(self, deck_file: str) -> List[Document]:
+        """Load the documents of one deck file, using the document cache"""
+        deck_path = os.path.join(self.data_dir, deck_file)
+        deck_name = deck_file.replace('.json', '')
+        return self._load_cached(deck_path, f'deck_{deck_name}', self._build_deck_docs)
+    
+    def _build_deck_docs(self, deck_path: str) -> List[Document]:
+        """Create the overview and card list documents for one deck file"""
+        deck_name = os.path.basename(deck_path).replace('.json', '')
+        
+        with open(deck_path, 'rb') as f:
+            raw = f.read()
+        deck_data = orjson.loads(raw) if orjson else json.loads(raw)
+        
+        docs = []
+        
+        # Create deck overview document
+        overview_doc = self._create_deck_overview(deck_data, deck_name)
+        if overview_doc:
+            docs.append(overview_doc)
+        
+        # Create detailed card list document
+        detail_doc = self._create_deck_details(deck_data, deck_name)
+        if detail_doc:
+            docs.append(detail_doc)
+        
+        return docs
+    
+    def _enhance_card_content(self, df: pd.DataFrame) -> pd.Series:
         """
         Enhance card content for better retrieval.
-        Formats the content in a more searchable way.
+        Formats every card in a more searchable way using column-wise string ops.
+        
+        Args:
+            df: Cards with stripped column names and values
+            
+        Returns:
+            Series of enhanced content strings, one per card
         """
-        lines = content.split('\n')
-        card_dict = {}
-        
-        for line in lines:
-            if ': ' in line:
-                key, value = line.split(': ', 1)
-                card_dict[key.strip()] = value.strip()
-        
-        # Create enhanced searchable content
-        enhanced = []
-        
-        # Name and type first
-        if 'Name' in card_dict:
-            enhanced.append(f"Card Name: {card_dict['Name']}")
-        if 'Card Type' in card_dict:
-            enhanced.append(f"Type: {card_dict['Card Type']}")
-        
-        # Key attributes
-        if 'Elements' in card_dict:
-            enhanced.append(f"Elements: {card_dict['Elements']}")
-        if 'Cost' in card_dict:
-            enhanced.append(f"Cost: {card_dict['Cost']}")
-        if 'Attribute' in card_dict:
-            enhanced.append(f"Attribute/Skill: {card_dict['Attribute']}")
-        
-        # Effect (most important for deck building)
-        if 'Effect' in card_dict:
-            enhanced.append(f"Effect: {card_dict['Effect']}")
-        
-        # Stats for characters
-        if 'Healthy' in card_dict:
-            enhanced.append(f"Stats (Healthy): {card_dict['Healthy']}")
-        if 'Injured' in card_dict:
-            enhanced.append(f"Stats (Injured): {card_dict['Injured']}")
-        
-        # Additional info
-        if 'Rarity' in card_dict:
-            enhanced.append(f"Rarity: {card_dict['Rarity']}")
-        if 'Card Set' in card_dict:
-            enhanced.append(f"Set: {card_dict['Card Set']}")
-        
-        return '\n'.join(enhanced)
+        # Each present field becomes "Label: value\n"; missing values add nothing
+        enhanced = pd.Series('', index=df.index, dtype=object)
+        for column, label in ENHANCED_CARD_FIELDS:
+            if column in df.columns:
+                enhanced += (label + ': ' + df[column] + '\n').fillna('')
+        
+        # Drop the trailing newline of the last field
+        return enhanced.str[:-1]
     
-    def _extract_card_metadata(self, content: str) -> Dict[str, Any]:
-        """Extract structured metadata from card content for filtering"""
-        lines = content.split('\n')
-        metadata = {}
-        
-        for line in lines:
-            if ': ' in line:
-                key, value = line.split(': ', 1)
-                key = key.strip().lower().replace(' ', '_')
-                metadata[key] = value.strip()
-        
-        # Extract specific attributes for filtering
-        if 'elements' in metadata:
-            elements = metadata['elements'].split()
-            metadata['element_list'] = elements
-            metadata['element_count'] = len(elements)
-        
-        if 'cost' in metadata and metadata['cost']:
+    def _extract_card_metadata(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Extract structured metadata for filtering from every card.
+        
+        Args:
+            df: Cards with stripped column names and values
+            
+        Returns:
+            List of metadata dictionaries, one per card
+        """
+        fields = df.set_axis(df.columns.str.lower().str.replace(' ', '_'), axis=1)
+        
+        # Derived attributes are computed per column and only exist for some cards
+        derived = {}
+        if 'elements' in fields.columns:
+            elements = fields['elements'].dropna().str.split()
+            derived['element_list'] = elements
+            derived['element_count'] = elements.str.len()
+        
+        if 'cost' in fields.columns:
             # Parse cost for filtering (e.g., "2 F F" means 2 colorless + 2 fire)
-            cost_parts = metadata['cost'].split()
-            total_cost = 0
-            for part in cost_parts:
-                if part.isdigit():
-                    total_cost += int(part)
-                else:
-                    total_cost += 1  # Each letter represents 1 mana
-            metadata['total_cost'] = total_cost
-        
-        if 'turn_count' in metadata:
-            try:
-                metadata['turn_count_int'] = int(metadata['turn_count'])
-            except:
-                metadata['turn_count_int'] = 0
+            cost = fields['cost']
+            cost = cost[cost.notna() & (cost != '')]
+            derived['total_cost'] = cost.str.split().apply(
+                # Each letter represents 1 mana
+                lambda parts: sum(int(part) if part.isdigit() else 1 for part in parts)
+            )
+        
+        if 'turn_count' in fields.columns:
+            derived['turn_count_int'] = fields['turn_count'].dropna().apply(_parse_int)
+        
+        derived = {key: values.to_dict() for key, values in derived.items()}
+        
+        keys = fields.columns.tolist()
+        metadatas = []
+        for index, *values in fields.itertuples(name=None):
+            metadata = {key: value for key, value in zip(keys, values) if pd.notna(value)}
+            for key, values in derived.items():
+                if index in values:
+                    metadata[key] = values[index]
+            metadatas.append(metadata)
         
-        return metadata
+        return metadatas
     
     def _create_deck_overview(self, deck_data: Dict, deck_name: str) -> Document:
         """Create an overview document for a deck"""
@@ -252,41 +422,31 @@ class PrimalTCGDocumentLoader:
         deck_cards = deck_data['deck']
         
         # Analyze deck composition
-        card_types = {}
-        elements = {}
-        skills = {}
+        card_types = Counter(card.get('cardType', 'Unknown') for card in deck_cards)
+        elements = Counter(elem for card in deck_cards for elem in (card.get('element') or ()))
+        skills = Counter(skill for skill in (card.get('skill', '') for card in deck_cards) if skill)
         total_cards = len(deck_cards)
         
-        for card in deck_cards:
-            # Count card types
-            card_type = card.get('cardType', 'Unknown')
-            card_types[card_type] = card_types.get(card_type, 0) + 1
-            
-            # Count elements
-            if 'element' in card and card['element']:
-                for elem in card['element']:
-                    elements[elem] = elements.get(elem, 0) + 1
-            
-            # Count skills/attributes
-            skill = card.get('skill', '')
-            if skill:
-                skills[skill] = skills.get(skill, 0) + 1
-        
-        # Create overview content
-        content = f"""Deck: {deck_name}
-Total Cards: {total_cards}
-
-Card Type Distribution:
-{self._format_distribution(card_types)}
-
-Element Distribution:
-{self._format_distribution(elements)}
-
-Skill/Attribute Distribution:
-{self._format_distribution(skills)}
-
-This deck focuses on {', '.join(list(skills.keys())[:3])} strategies with {', '.join(list(elements.keys())[:2])} elements.
-"""
+        main_elements = list(elements.keys())[:2]
+        main_skills = list(skills.keys())[:3]
+        
+        # Create overview content (one join, ending with a newline)
+        content = '\n'.join([
+            f"Deck: {deck_name}",
+            f"Total Cards: {total_cards}",
+            "",
+            "Card Type Distribution:",
+            self._format_distribution(card_types),
+            "",
+            "Element Distribution:",
+            self._format_distribution(elements),
+            "",
+            "Skill/Attribute Distribution:",
+            self._format_distribution(skills),
+            "",
+            f"This deck focuses on {', '.join(main_skills)} strategies with {', '.join(main_elements)} elements.",
+            "",
+        ])
         
         return Document(
             page_content=content,
@@ -295,8 +455,8 @@ This deck focuses on {', '.join(list(skills.keys())[:3])} strategies with {', '.
                 'doc_type': 'deck_overview',
                 'deck_name': deck_name,
                 'total_cards': total_cards,
-                'main_elements': list(elements.keys())[:2],
-                'main_skills': list(skills.keys())[:3]
+                'main_elements': main_elements,
+                'main_skills': main_skills
             }
         )
     
@@ -307,39 +467,38 @@ This deck focuses on {', '.join(list(skills.keys())[:3])} strategies with {', '.
         
         deck_cards = deck_data['deck']
         
-        # Group cards by type for better organization
-        characters = []
-        abilities = []
-        fields = []
-        strategies = []
-        
-        for card in deck_cards:
-            card_info = f"- {card.get('name', 'Unknown')}: {card.get('text', 'No effect')[:100]}..."
-            
-            card_type = card.get('cardType', '').lower()
-            if 'character' in card_type:
-                characters.append(card_info)
-            elif 'ability' in card_type:
-                abilities.append(card_info)
-            elif 'field' in card_type:
-                fields.append(card_info)
-            elif 'strategy' in card_type:
-                strategies.append(card_info)
-        
-        content = f"""Deck Card List: {deck_name}
-
-Characters ({len(characters)}):
-{chr(10).join(characters[:20])}  # Limit to first 20 for space
-
-Abilities ({len(abilities)}):
-{chr(10).join(abilities[:10])}
-
-Fields ({len(fields)}):
-{chr(10).join(fields[:5])}
-
-Strategies ({len(strategies)}):
-{chr(10).join(strategies[:5])}
-"""
+        # Group cards by type for better organization: sort once by group
+        # (stable, so deck order is kept within a group), then split the runs
+        ranked = sorted(deck_cards, key=self._deck_card_rank)
+        groups = {
+            DECK_CARD_GROUPS[rank]: [
+                f"- {card.get('name', 'Unknown')}: {card.get('text', 'No effect')[:100]}..."
+                for card in cards
+            ]
+            for rank, cards in groupby(ranked, key=self._deck_card_rank)
+            if rank < len(DECK_CARD_GROUPS)
+        }
+        characters = groups.get('character', [])
+        abilities = groups.get('ability', [])
+        fields = groups.get('field', [])
+        strategies = groups.get('strategy', [])
+        
+        content = '\n'.join([
+            f"Deck Card List: {deck_name}",
+            "",
+            f"Characters ({len(characters)}):",
+            '\n'.join(characters[:20]),  # Limit to first 20 for space
+            "",
+            f"Abilities ({len(abilities)}):",
+            '\n'.join(abilities[:10]),
+            "",
+            f"Fields ({len(fields)}):",
+            '\n'.join(fields[:5]),
+            "",
+            f"Strategies ({len(strategies)}):",
+            '\n'.join(strategies[:5]),
+            "",
+        ])
         
         return Document(
             page_content=content,
@@ -352,6 +511,15 @@ Strategies ({len(strategies)}):
             }
         )
     
+    @staticmethod
+    def _deck_card_rank(card: Dict) -> int:
+        """Index of the card's group in DECK_CARD_GROUPS (len(DECK_CARD_GROUPS) when ungrouped)"""
+        card_type = card.get('cardType', '').lower()
+        for rank, group in enumerate(DECK_CARD_GROUPS):
+            if group in card_type:
+                return rank
+        return len(DECK_CARD_GROUPS)
+    
     def _format_distribution(self, dist: Dict) -> str:
         """Format a distribution dictionary as a readable string"""
         sorted_items = sorted(dist.items(), key=lambda x: x[1], reverse=True)
@@ -0,0 +1,615 @@
+"""
+In-memory NumPy vector store for the Primal TCG Q&A system
+Stores document embeddings as scalar-quantized int8 rows for compact, fast cosine search
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain.schema import Document
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import faiss
+except ImportError:  # HNSW index is optional
+    faiss = None
+
+try:
+    import hnswlib
+except ImportError:  # Fallback HNSW backend is optional
+    hnswlib = None
+
+# Rows scored per block, bounding the temporary float32 copy of int8 codes
+SCORE_BLOCK_ROWS = 4096
+
+# Texts per embedding request, and how many requests may be in flight at once
+EMBED_BATCH_SIZE = 512
+MAX_CONCURRENT_BATCHES = 4
+
+# HNSW graph parameters: neighbours per node, and candidate list sizes
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 100
+HNSW_EF_SEARCH = 64
+
+# Product quantization: dimensions per sub-vector and bits per sub-vector code;
+# training needs at least one row per centroid (1536-d -> 96 one-byte codes)
+PQ_SUBVECTOR_DIM = 16
+PQ_NBITS = 8
+PQ_MIN_TRAINING_ROWS = 1 << PQ_NBITS
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    LangChain vector store backed by a single NumPy embedding matrix.
+
+    Design Decision: SQ8 scalar quantization (quantization="sq8")
+    - Embeddings are L2-normalized, then each dimension is scaled by its
+      max absolute value and rounded to int8 (4x smaller than float32)
+    - The per-dimension scale is folded into the query, so a search is one
+      matrix-vector product over the codes
+    - quantization="fp16" stores half-precision rows (2x smaller, no training,
+      near-lossless for cosine); quantization=None keeps plain float32 rows
+    - quantization="pq" (needs faiss) stores one byte per PQ_SUBVECTOR_DIM
+      dimensions (64x smaller than float32) and scores rows from a per-query
+      lookup table of sub-vector/centroid products; it is the lossiest option
+      and needs PQ_MIN_TRAINING_ROWS rows in the first batch (else sq8 is used)
+
+    Design Decision: Optional HNSW candidate index (index="hnsw")
+    - A FAISS IndexHNSWSQ graph (8-bit or fp16 codes, following quantization)
+      finds the nearest rows in roughly logarithmic time instead of scanning
+      the whole matrix
+    - Without faiss, an hnswlib graph with the same parameters is used
+      instead (float32 vectors, cosine space)
+    - The matrix is still kept for MMR and for saving; index="flat" (or
+      neither library installed) falls back to the exact scan
+
+    Design Decision: Metadata filters scan only the matching rows
+    - filter={"key": value, ...} selects rows through cached per-(key, value)
+      masks and scores just those rows exactly
+    - This always returns k matches when k exist, unlike post-filtering an
+      unfiltered top-k, and a restricted HNSW graph walk loses recall on
+      selective filters
+
+    Scores are cosine similarities (higher is better).
+    """
+
+    def __init__(self,
+                 embedding: Embeddings,
+                 quantization: Optional[str] = "sq8",
+                 index: str = "flat"):
+        """
+        Initialize an empty store.
+
+        Args:
+            embedding: Embedding model for documents and queries
+            quantization: "sq8" for int8 rows, "fp16" for float16 rows, "pq" for
+                product-quantized codes, or None for float32 rows
+            index: "flat" for an exact scan, or "hnsw" for an HNSW graph
+                (FAISS, else hnswlib)
+        """
+        if quantization not in (None, "sq8", "fp16", "pq"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        if quantization == "pq" and faiss is None:
+            print("Warning: faiss is not installed, using sq8 instead of product quantization")
+            quantization = "sq8"
+        if index not in ("flat", "hnsw"):
+            raise ValueError(f"Unsupported index: {index}")
+        if index == "hnsw" and faiss is None and hnswlib is None:
+            print("Warning: neither faiss nor hnswlib is installed, using an exact scan instead of HNSW")
+            index = "flat"
+
+        self._embedding = embedding
+        self.quantization = quantization
+        self.index = index
+        self.documents: List[Document] = []
+        self.ids: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+        self._pq = None
+        self._pq_centroids: Optional[np.ndarray] = None
+        self._hnsw = None
+        # Set while the FAISS graph is memory-mapped (read-only) from this file
+        self._hnsw_path: Optional[str] = None
+        self._metadata_masks: Dict[Tuple[str, Any], np.ndarray] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model used by the store"""
+        return self._embedding
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        """Convert embeddings to unit-length float32 rows"""
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _set_pq(self, pq) -> None:
+        """Use a trained product quantizer, keeping its centroids as (M, ksub, dsub)"""
+        self._pq = pq
+        self._pq_centroids = faiss.vector_to_array(pq.centroids).reshape(pq.M, pq.ksub, pq.dsub)
+
+    def _append(self, vectors: np.ndarray) -> None:
+        """Add normalized rows to the matrix, quantizing when enabled"""
+        if self.quantization == "pq" and self._pq is None:
+            dim = vectors.shape[1]
+            if len(vectors) < PQ_MIN_TRAINING_ROWS or dim % PQ_SUBVECTOR_DIM:
+                print(f"Warning: product quantization needs {PQ_MIN_TRAINING_ROWS}+ rows and a dimension "
+                      f"divisible by {PQ_SUBVECTOR_DIM}, using sq8 instead")
+                self.quantization = "sq8"
+            else:
+                pq = faiss.ProductQuantizer(dim, dim // PQ_SUBVECTOR_DIM, PQ_NBITS)
+                pq.cp.min_points_per_centroid = 1  # small corpora are expected
+                pq.train(vectors)
+                self._set_pq(pq)
+
+        if self.quantization == "pq":
+            codes = self._pq.compute_codes(vectors)
+            self._matrix = codes if self._matrix is None else np.vstack([self._matrix, codes])
+            return
+
+        if self.quantization != "sq8":
+            dtype = np.float16 if self.quantization == "fp16" else np.float32
+            vectors = vectors.astype(dtype)
+            self._matrix = vectors if self._matrix is None else np.vstack([self._matrix, vectors])
+            return
+
+        scale = np.abs(vectors).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0 / 127.0
+        if self._matrix is None:
+            self._scale = scale
+            self._matrix = self._quantize(vectors)
+            return
+
+        # Widen the scale when new rows fall outside it and requantize old rows
+        if np.any(scale > self._scale):
+            new_scale = np.maximum(scale, self._scale)
+            self._matrix = np.rint(self._matrix * (self._scale / new_scale)).astype(np.int8)
+            self._scale = new_scale
+        self._matrix = np.vstack([self._matrix, self._quantize(vectors)])
+
+    def _quantize(self, vectors: np.ndarray) -> np.ndarray:
+        """Map normalized rows to int8 codes with the current scale"""
+        return np.clip(np.rint(vectors / self._scale), -127, 127).astype(np.int8)
+
+    def _rows(self, indices) -> np.ndarray:
+        """Reconstruct float32 rows for the given indices"""
+        rows = self._matrix[indices]
+        if self.quantization is None:
+            return rows
+        if self.quantization == "fp16":
+            return rows.astype(np.float32)
+        if self.quantization == "pq":
+            return self._pq.decode(np.ascontiguousarray(rows))
+        return rows.astype(np.float32) * self._scale
+
+    def _scores(self, query_vector: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of a normalized query against every row, or the given rows"""
+        matrix = self._matrix if rows is None else self._matrix[rows]
+        if self.quantization is None:
+            return matrix @ query_vector
+
+        if self.quantization == "pq":
+            # Asymmetric distance: each row's score is the sum of its codes' entries
+            # in a (M, ksub) table of query-sub-vector/centroid products
+            table = np.einsum("mkd,md->mk", self._pq_centroids, query_vector.reshape(self._pq.M, -1))
+            subvectors = np.arange(self._pq.M)
+            scores = np.empty(len(matrix), dtype=np.float32)
+            for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+                block = matrix[start:start + SCORE_BLOCK_ROWS]
+                scores[start:start + len(block)] = table[subvectors, block].sum(axis=1)
+            return scores
+
+        # Compact rows are widened to float32 block by block for the BLAS product
+        scaled_query = query_vector if self.quantization == "fp16" else query_vector * self._scale
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            block = matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        return scores
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Indices of the rows whose metadata matches every key/value of the filter"""
+        mask = np.ones(len(self.documents), dtype=bool)
+        for key, value in filter.items():
+            key_mask = self._metadata_masks.get((key, value))
+            if key_mask is None:
+                key_mask = np.fromiter((doc.metadata.get(key) == value for doc in self.documents),
+                                       dtype=bool, count=len(self.documents))
+                self._metadata_masks[(key, value)] = key_mask
+            mask &= key_mask
+        return np.flatnonzero(mask)
+
+    def _index_vectors(self, vectors: np.ndarray) -> None:
+        """Add normalized rows to the HNSW graph, training its quantizer on the first rows"""
+        if faiss is None:
+            self._index_vectors_hnswlib(vectors)
+            return
+
+        if self._hnsw_path is not None:
+            # A memory-mapped graph cannot grow; load an owned copy first
+            self._hnsw = faiss.read_index(self._hnsw_path)
+            self._hnsw_path = None
+
+        if self._hnsw is None:
+            if self.quantization is None:
+                self._hnsw = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            elif self.quantization == "pq":
+                self._hnsw = faiss.IndexHNSWPQ(vectors.shape[1], self._pq.M, HNSW_M, PQ_NBITS,
+                                               faiss.METRIC_INNER_PRODUCT)
+                faiss.downcast_index(self._hnsw.storage).pq.cp.min_points_per_centroid = 1
+            else:
+                qtype = (faiss.ScalarQuantizer.QT_fp16 if self.quantization == "fp16"
+                         else faiss.ScalarQuantizer.QT_8bit)
+                self._hnsw = faiss.IndexHNSWSQ(vectors.shape[1], qtype, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            self._hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            self._hnsw.train(vectors)
+        self._hnsw.add(vectors)
+
+    def _index_vectors_hnswlib(self, vectors: np.ndarray) -> None:
+        """Add normalized rows to an hnswlib graph, labelling them by row index"""
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+            self._hnsw.init_index(max_elements=len(vectors), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        start = self._hnsw.get_current_count()
+        if start + len(vectors) > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(max(start + len(vectors), 2 * self._hnsw.get_max_elements()))
+        self._hnsw.add_items(vectors, np.arange(start, start + len(vectors)))
+
+    def _search(self,
+                query_vector: np.ndarray,
+                k: int,
+                filter: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and cosine scores of the k rows nearest to a normalized query, best first"""
+        if filter:
+            rows = self._filter_rows(filter)
+            scores = self._scores(query_vector, rows)
+            top = self._top_k(scores, k)
+            return rows[top], scores[top]
+
+        if self._hnsw is not None and faiss is None:
+            k = min(k, self._hnsw.get_current_count())
+            if k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            self._hnsw.set_ef(max(HNSW_EF_SEARCH, k))
+            labels, distances = self._hnsw.knn_query(query_vector, k=k)
+            return labels[0].astype(np.int64), 1.0 - distances[0]
+
+        if self._hnsw is not None:
+            k = min(k, self._hnsw.ntotal)
+            if k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            self._hnsw.hnsw.efSearch = max(HNSW_EF_SEARCH, k)
+            scores, indices = self._hnsw.search(query_vector[None, :], k)
+            found = indices[0] >= 0
+            return indices[0][found], scores[0][found]
+
+        scores = self._scores(query_vector)
+        top = self._top_k(scores, k)
+        return top, scores[top]
+
+    def _result(self, index: int) -> Document:
+        """Copy of a stored document, so callers can annotate results without changing the store"""
+        doc = self.documents[index]
+        return Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first"""
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    @staticmethod
+    def _is_batch_rejected(error: Exception) -> bool:
+        """
+        Whether the batch itself was rejected (400 bad request, e.g. over the
+        token limit, or 413 payload too large). Auth, not-found and rate-limit
+        errors would fail the same way for smaller batches, so they are not.
+        """
+        return getattr(error, "status_code", None) in (400, 413)
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """Embed one batch, splitting it into sequential halves if the batch is rejected"""
+        try:
+            return self._embedding.embed_documents(batch)
+        except Exception as e:
+            if len(batch) == 1 or not self._is_batch_rejected(e):
+                raise
+        middle = len(batch) // 2
+        return self._embed_batch(batch[:middle]) + self._embed_batch(batch[middle:])
+
+    async def _aembed_batch(self, batch: List[str]) -> List[List[float]]:
+        """Async version of _embed_batch()"""
+        try:
+            return await self._embedding.aembed_documents(batch)
+        except Exception as e:
+            if len(batch) == 1 or not self._is_batch_rejected(e):
+                raise
+        middle = len(batch) // 2
+        return await self._aembed_batch(batch[:middle]) + await self._aembed_batch(batch[middle:])
+
+    def _embed_texts(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        """Embed texts in batches, keeping several batch requests in flight"""
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(texts)
+
+        with ThreadPoolExecutor(max_workers=min(len(batches), MAX_CONCURRENT_BATCHES)) as executor:
+            return [vector for vectors in executor.map(self._embed_batch, batches)
+                    for vector in vectors]
+
+    async def _aembed_texts(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        """Async version of _embed_texts()"""
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+
+        async def embed(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aembed_batch(batch)
+
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+        return [vector for vectors in results for vector in vectors]
+
+    def _add_embedded(self,
+                      texts: List[str],
+                      embeddings: List[List[float]],
+                      metadatas: Optional[List[dict]],
+                      ids: Optional[List[str]]) -> List[str]:
+        """Store texts with their already computed embeddings"""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        vectors = self._normalize(embeddings)
+        self._append(vectors)
+        self._metadata_masks.clear()
+        if self.index == "hnsw":
+            self._index_vectors(vectors)
+        self.documents.extend(
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas)
+        )
+        self.ids.extend(ids)
+        return ids
+
+    def add_texts(self,
+                  texts: Iterable[str],
+                  metadatas: Optional[List[dict]] = None,
+                  **kwargs: Any) -> List[str]:
+        """
+        Embed and store texts.
+
+        Args:
+            texts: Texts to add
+            metadatas: Optional metadata per text
+            batch_size: Texts per embedding request (default EMBED_BATCH_SIZE)
+
+        Returns:
+            IDs of the added documents
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        embeddings = self._embed_texts(texts, kwargs.get("batch_size") or EMBED_BATCH_SIZE)
+        return self._add_embedded(texts, embeddings, metadatas, kwargs.get("ids"))
+
+    async def aadd_texts(self,
+                         texts: Iterable[str],
+                         metadatas: Optional[List[dict]] = None,
+                         **kwargs: Any) -> List[str]:
+        """Async version of add_texts(); embedding batches are requested concurrently"""
+        texts = list(texts)
+        if not texts:
+            return []
+        embeddings = await self._aembed_texts(texts, kwargs.get("batch_size") or EMBED_BATCH_SIZE)
+        return self._add_embedded(texts, embeddings, metadatas, kwargs.get("ids"))
+
+    @classmethod
+    def from_texts(cls,
+                   texts: List[str],
+                   embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "NumpyVectorStore":
+        """Create a store from texts"""
+        store = cls(embedding,
+                    quantization=kwargs.pop("quantization", "sq8"),
+                    index=kwargs.pop("index", "flat"))
+        store.add_texts(texts, metadatas=metadatas, **kwargs)
+        return store
+
+    def save(self, directory: str) -> None:
+        """
+        Write the store to a directory (embedding matrix as .npy, documents as JSON).
+
+        Args:
+            directory: Target directory (created if missing)
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "matrix.npy"), self._matrix)
+        if self._scale is not None:
+            np.save(os.path.join(directory, "scale.npy"), self._scale)
+        if self._pq is not None:
+            faiss.write_ProductQuantizer(self._pq, os.path.join(directory, "pq.faiss"))
+        if self._hnsw is not None and faiss is None:
+            self._hnsw.save_index(os.path.join(directory, "index.hnsw"))
+        elif self._hnsw is not None:
+            faiss.write_index(self._hnsw, os.path.join(directory, "index.faiss"))
+        with open(os.path.join(directory, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "quantization": self.quantization,
+                "index": self.index,
+                "ids": self.ids,
+                "documents": [
+                    {"page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc in self.documents
+                ]
+            }, f, default=str)
+
+    @classmethod
+    def load(cls, directory: str, embedding: Embeddings, mmap: bool = True) -> "NumpyVectorStore":
+        """
+        Load a store written by save().
+
+        Args:
+            directory: Directory holding the saved store
+            embedding: Embedding model for queries and new documents
+            mmap: Memory-map the matrix (and the FAISS graph's stored vectors) so only
+                the pages touched by searches are read
+
+        Returns:
+            Loaded NumpyVectorStore
+        """
+        with open(os.path.join(directory, "documents.json"), encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data["quantization"] == "pq" and faiss is None:
+            raise ImportError("faiss is required to load a product-quantized store")
+        store = cls(embedding, quantization=data["quantization"], index=data.get("index", "flat"))
+        store._matrix = np.load(os.path.join(directory, "matrix.npy"), mmap_mode="r" if mmap else None)
+        scale_path = os.path.join(directory, "scale.npy")
+        if os.path.exists(scale_path):
+            store._scale = np.load(scale_path)
+        if store.quantization == "pq":
+            store._set_pq(faiss.read_ProductQuantizer(os.path.join(directory, "pq.faiss")))
+        index_path = os.path.join(directory, "index.faiss" if faiss is not None else "index.hnsw")
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) if mmap and faiss is not None else None
+        if store.index == "hnsw" and os.path.exists(index_path) and mmap_flag is not None:
+            # Map the graph's stored vectors in place, so they are paged in on demand
+            store._hnsw = faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+            store._hnsw_path = index_path
+        elif store.index == "hnsw" and os.path.exists(index_path) and faiss is not None:
+            store._hnsw = faiss.read_index(index_path)
+        elif store.index == "hnsw" and os.path.exists(index_path):
+            store._hnsw = hnswlib.Index(space="cosine", dim=store._matrix.shape[1])
+            store._hnsw.load_index(index_path, max_elements=len(store._matrix))
+        elif store.index == "hnsw":
+            # Saved without a graph for the installed backend; rebuild it from the rows
+            store._index_vectors(store._rows(np.arange(len(store._matrix))))
+        store.ids = data["ids"]
+        store.documents = [Document(**doc) for doc in data["documents"]]
+        return store
+
+    def similarity_search_with_score_by_vector(self,
+                                               embedding: List[float],
+                                               k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        """
+        Return the k most similar documents with their cosine scores.
+
+        Keyword args: filter={"key": value} restricts matches; score_threshold
+        drops results scoring below it.
+        """
+        if self._matrix is None:
+            return []
+        indices, scores = self._search(self._normalize(embedding)[0], k, kwargs.get("filter"))
+        if kwargs.get("score_threshold") is not None:
+            keep = scores >= kwargs["score_threshold"]
+            indices, scores = indices[keep], scores[keep]
+        return [(self._result(i), float(score)) for i, score in zip(indices, scores)]
+
+    def similarity_search_with_score(self,
+                                     query: str,
+                                     k: int = 4,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Return the k documents most similar to the query with their scores"""
+        return self.similarity_search_with_score_by_vector(
+            self._embedding.embed_query(query), k=k, **kwargs
+        )
+
+    def similarity_search_by_vector(self,
+                                    embedding: List[float],
+                                    k: int = 4,
+                                    **kwargs: Any) -> List[Document]:
+        """Return the k documents most similar to an embedding"""
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        """Return the k documents most similar to the query"""
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k=k, **kwargs)
+
+    @classmethod
+    def _mmr_select(cls,
+                    query_vector: np.ndarray,
+                    candidates: np.ndarray,
+                    k: int,
+                    lambda_mult: float) -> List[int]:
+        """
+        Pick k candidate rows by maximal marginal relevance.
+
+        Query similarities are one matrix-vector product; each step then
+        scores every candidate against only the newly selected row (one more
+        product), updates its similarity to the closest selected row and
+        takes a masked argmax. This is O(k * fetch_k) dot products instead of
+        the full fetch_k x fetch_k pairwise matrix.
+
+        Args:
+            query_vector: Normalized query embedding
+            candidates: Candidate rows (re-normalized here)
+            k: Number of rows to select
+            lambda_mult: Balance between relevance (1) and diversity (0)
+
+        Returns:
+            Positions of the selected rows, in selection order
+        """
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+
+        candidates = cls._normalize(candidates)
+        query_similarity = candidates @ query_vector
+
+        selected = [int(np.argmax(query_similarity))]
+        closest_selected = candidates @ candidates[selected[0]]
+        available = np.ones(len(candidates), dtype=bool)
+        available[selected[0]] = False
+
+        while len(selected) < k:
+            mmr = lambda_mult * query_similarity - (1 - lambda_mult) * closest_selected
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+            np.maximum(closest_selected, candidates @ candidates[best], out=closest_selected)
+
+        return selected
+
+    def max_marginal_relevance_search_by_vector(self,
+                                                embedding: List[float],
+                                                k: int = 4,
+                                                fetch_k: int = 20,
+                                                lambda_mult: float = 0.5,
+                                                **kwargs: Any) -> List[Document]:
+        """Return k documents selected by maximal marginal relevance"""
+        if self._matrix is None:
+            return []
+        query_vector = self._normalize(embedding)[0]
+        candidates, _ = self._search(query_vector, fetch_k, kwargs.get("filter"))
+        selected = self._mmr_select(query_vector, self._rows(candidates), k, lambda_mult)
+        return [self._result(candidates[i]) for i in selected]
+
+    def max_marginal_relevance_search(self,
+                                      query: str,
+                                      k: int = 4,
+                                      fetch_k: int = 20,
+                                      lambda_mult: float = 0.5,
+                                      **kwargs: Any) -> List[Document]:
+        """Return k documents for the query selected by maximal marginal relevance"""
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query),
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            **kwargs
+        )
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities
+        return lambda score: score
@@ -3,14 +3,37 @@ Vector Store and Retrieval System for Primal TCG Q&A
 Implements multiple retrieval strategies: similarity, MMR, threshold
 """
 
-from typing import List, Dict, Any, Optional
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Dict, Any, Optional
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import DocArrayInMemorySearch, Chroma
+from langchain_community.vectorstores import Chroma
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from langchain.schema import Document
 from langchain.retrievers import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import LLMChainExtractor
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
 from langchain_openai import ChatOpenAI
 import os
+import tiktoken
+
+from retrievers.numpy_store import EMBED_BATCH_SIZE, NumpyVectorStore
+from utils.query_cache import CachedEmbedder, QueryCache
+
+# text-embedding-3 models return shortened (Matryoshka) vectors on request;
+# 512 dimensions keep retrieval quality on short card texts at a third of the size
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 512
+
+DEFAULT_CACHE_CONFIG = {"max_size": 2000, "ttl_seconds": 600, "enabled": True}
+
+# Bumped when the saved store's layout changes (2: documents carry metadata['_idx'])
+VECTOR_CACHE_VERSION = 2
 
 
 class PrimalTCGVectorStore:
@@ -19,40 +42,176 @@ class PrimalTCGVectorStore:
     Optimized for deck building assistance queries.
     """
     
-    def __init__(self, use_chroma: bool = False, persist_directory: str = None):
+    def __init__(self,
+                 use_chroma: bool = False,
+                 persist_directory: str = None,
+                 quantization: Optional[str] = "sq8",
+                 index: str = "hnsw",
+                 cache_dir: Optional[str] = None,
+                 embedding_cache_dir: Optional[str] = None,
+                 cache_config: Optional[Dict[str, Any]] = None,
+                 embedding_model: str = EMBEDDING_MODEL,
+                 embedding_dimensions: Optional[int] = EMBEDDING_DIMENSIONS):
         """
         Initialize vector store.
         
         Args:
             use_chroma: Use Chroma for persistence instead of in-memory
             persist_directory: Directory for Chroma persistence
+            quantization: Embedding storage of the in-memory store
+                ("sq8" for int8 rows, "fp16" for float16 rows, "pq" for product-quantized
+                codes, None for float32)
+            index: Search index of the in-memory store ("hnsw" for a FAISS HNSW
+                graph, "flat" for an exact scan)
+            cache_dir: Directory where the in-memory store is saved after the
+                first build and memory-mapped on later runs
+            embedding_cache_dir: Directory of a persistent per-document embedding
+                cache, so unchanged documents are not re-embedded when others change
+            cache_config: In-process cache of query embeddings and search results
+                ("max_size", "ttl_seconds", "enabled"; defaults to DEFAULT_CACHE_CONFIG)
+            embedding_model: OpenAI embedding model
+            embedding_dimensions: Output size of the embeddings (None for the
+                model's full size; only text-embedding-3 models support it)
         """
-        self.embeddings = OpenAIEmbeddings()
+        base_embeddings = OpenAIEmbeddings(model=embedding_model, dimensions=embedding_dimensions)
+        # Identifies the vectors in cache keys and namespaces, so sizes never mix
+        self.embedding_model = (f"{embedding_model}-{embedding_dimensions}d"
+                                if embedding_dimensions else embedding_model)
+        self.embeddings = base_embeddings
+        if embedding_cache_dir:
+            # Keyed by the SHA-256 of each document's text, namespaced by model
+            self.embeddings = CacheBackedEmbeddings.from_bytes_store(
+                base_embeddings,
+                LocalFileStore(embedding_cache_dir),
+                namespace=self.embedding_model,
+                key_encoder="sha256"
+            )
+        
+        # Repeated queries reuse their embedding and search results
+        cache_config = {**DEFAULT_CACHE_CONFIG, **(cache_config or {})}
+        self.query_cache = None
+        self.result_cache = None
+        if cache_config["enabled"]:
+            self.query_cache = QueryCache(cache_config["max_size"], cache_config["ttl_seconds"])
+            self.result_cache = QueryCache(cache_config["max_size"], cache_config["ttl_seconds"])
+            self.embeddings = CachedEmbedder(self.embeddings, self.query_cache, model=self.embedding_model)
         self.use_chroma = use_chroma
         self.persist_directory = persist_directory
+        self.quantization = quantization
+        self.index = index
+        self.cache_dir = cache_dir
         self.vectorstore = None
         self.documents = []
+        self._documents_key: Optional[str] = None
+        
+    def create_vectorstore(self, documents: List[Document], batch_size: int = EMBED_BATCH_SIZE) -> None:
+        """
+        Create vector store from documents.
+        
+        Documents are hashed (texts and metadata); a call with the same documents
+        as the current store returns immediately, and a persisted store for them
+        (cache_dir or Chroma's persist_directory) is reopened instead of rebuilt.
+        
+        Args:
+            documents: Documents to index
+            batch_size: Documents per embedding request for the in-memory store
+                (batches are requested concurrently)
+        """
+        # Stable integer ID per document, used to dedupe merged search results
+        for i, doc in enumerate(documents):
+            doc.metadata['_idx'] = i
+        
+        # Nothing to do if these exact documents are already indexed
+        documents_key = self._cache_key(documents)
+        if self.vectorstore is not None and documents_key == self._documents_key:
+            return
         
-    def create_vectorstore(self, documents: List[Document]) -> None:
-        """Create vector store from documents"""
         self.documents = documents
+        self._documents_key = documents_key
+        if self.result_cache:
+            self.result_cache.clear()
         
         if self.use_chroma and self.persist_directory:
+            # Reopen the collection persisted for the same documents, else rebuild it
+            meta_path = os.path.join(self.persist_directory, "index_meta.json")
+            saved_key = None
+            if os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    saved_key = json.load(f).get("documents_key")
+            if saved_key == documents_key:
+                self.vectorstore = Chroma(
+                    persist_directory=self.persist_directory,
+                    embedding_function=self.embeddings
+                )
+                print(f"Loaded Chroma vector store with {len(documents)} documents")
+                return
+            if saved_key is not None:
+                # Drop the collection built for other documents instead of adding to it
+                Chroma(persist_directory=self.persist_directory,
+                       embedding_function=self.embeddings).delete_collection()
+            
             # Use Chroma for persistence
             self.vectorstore = Chroma.from_documents(
                 documents=documents,
                 embedding=self.embeddings,
                 persist_directory=self.persist_directory
             )
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"documents_key": documents_key}, f)
             print(f"Created Chroma vector store with {len(documents)} documents")
         else:
-            # Use in-memory store (like the lesson)
-            self.vectorstore = DocArrayInMemorySearch.from_documents(
+            # Reuse embeddings saved by an earlier run over the same documents
+            store_dir = os.path.join(self.cache_dir, documents_key) if self.cache_dir else None
+            if store_dir and os.path.exists(os.path.join(store_dir, "documents.json")):
+                self.vectorstore = NumpyVectorStore.load(store_dir, self.embeddings)
+                print(f"Loaded in-memory vector store with {len(documents)} documents from cache")
+                return
+            
+            # Use in-memory store (like the lesson), with quantized embeddings
+            self.vectorstore = NumpyVectorStore.from_documents(
                 documents=documents,
-                embedding=self.embeddings
+                embedding=self.embeddings,
+                quantization=self.quantization,
+                index=self.index,
+                batch_size=batch_size
             )
+            if store_dir:
+                self.vectorstore.save(store_dir)
             print(f"Created in-memory vector store with {len(documents)} documents")
     
+    def _cache_key(self, documents: List[Document]) -> str:
+        """Hash of the cache version, embedding model, storage format, index type and documents"""
+        # BLAKE2b is faster than SHA-256 in CPython; 8 bytes keeps the 16-character keys
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(f"{VECTOR_CACHE_VERSION}|{self.embedding_model}|{self.quantization}|{self.index}".encode())
+        for doc in documents:
+            digest.update(b"\0")
+            digest.update(doc.page_content.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(repr(sorted(doc.metadata.items())).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def _cached_results(self, key: tuple, search: Callable[[], List[Document]]) -> List[Document]:
+        """Run a search, or return the cached results of an identical earlier one"""
+        if self.result_cache is None:
+            return search()
+        
+        results = self.result_cache.get(key)
+        if results is None:
+            results = search()
+            self.result_cache.put(key, results)
+        return list(results)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Statistics of the query embedding and search result caches"""
+        if self.query_cache is None:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'query_embeddings': self.query_cache.stats(),
+            'search_results': self.result_cache.stats()
+        }
+    
     def similarity_search(self, 
                          query: str, 
                          k: int = 4,
@@ -68,28 +227,35 @@ class PrimalTCGVectorStore:
         if not self.vectorstore:
             raise ValueError("Vector store not initialized. Call create_vectorstore first.")
         
-        if filter and self.use_chroma:
-            # Chroma supports metadata filtering
-            return self.vectorstore.similarity_search(
-                query=query,
-                k=k,
-                filter=filter
-            )
-        else:
-            # For in-memory, we need to filter manually
-            results = self.vectorstore.similarity_search(query=query, k=k*2)
-            if filter:
-                filtered = []
-                for doc in results:
-                    match = True
-                    for key, value in filter.items():
-                        if doc.metadata.get(key) != value:
-                            match = False
-                            break
-                    if match:
-                        filtered.append(doc)
-                return filtered[:k]
-            return results[:k]
+        return self._cached_similarity_search(query, k, filter)
+    
+    def _cached_similarity_search(self,
+                                  query: str,
+                                  k: int,
+                                  filter: Optional[Dict],
+                                  embedding: Optional[List[float]] = None) -> List[Document]:
+        """similarity_search() through the result cache, optionally with the query already embedded"""
+        filter_key = tuple(sorted(filter.items())) if filter else None
+        return self._cached_results(
+            ("similarity", query, k, filter_key),
+            lambda: self._similarity_search(query, k, filter, embedding)
+        )
+    
+    def _similarity_search(self,
+                           query: str,
+                           k: int,
+                           filter: Optional[Dict],
+                           embedding: Optional[List[float]] = None) -> List[Document]:
+        """Uncached similarity_search()"""
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        
+        # Both Chroma and the in-memory store apply metadata filters natively
+        return self.vectorstore.similarity_search_by_vector(
+            embedding=embedding,
+            k=k,
+            filter=filter
+        )
     
     def mmr_search(self,
                    query: str,
@@ -109,11 +275,14 @@ class PrimalTCGVectorStore:
         if not self.vectorstore:
             raise ValueError("Vector store not initialized. Call create_vectorstore first.")
         
-        return self.vectorstore.max_marginal_relevance_search(
-            query=query,
-            k=k,
-            fetch_k=fetch_k,
-            lambda_mult=lambda_mult
+        return self._cached_results(
+            ("mmr", query, k, fetch_k, lambda_mult),
+            lambda: self.vectorstore.max_marginal_relevance_search(
+                query=query,
+                k=k,
+                fetch_k=fetch_k,
+                lambda_mult=lambda_mult
+            )
         )
     
     def threshold_search(self,
@@ -127,10 +296,13 @@ class PrimalTCGVectorStore:
         if not self.vectorstore:
             raise ValueError("Vector store not initialized. Call create_vectorstore first.")
         
-        # Get results with scores
+        # Get results with scores; the in-memory store applies the threshold
+        # to its score array in one vectorized comparison
+        threshold_kwargs = {} if self.use_chroma else {'score_threshold': score_threshold}
         results_with_scores = self.vectorstore.similarity_search_with_score(
             query=query,
-            k=k
+            k=k,
+            **threshold_kwargs
         )
         
         # Filter by threshold
@@ -139,7 +311,7 @@ class PrimalTCGVectorStore:
             # Note: Score interpretation depends on distance metric
             # For cosine similarity, higher is better (closer to 1)
             # For euclidean distance, lower is better (closer to 0)
-            # DocArrayInMemorySearch uses cosine by default
+            # NumpyVectorStore returns cosine similarity
             if score >= score_threshold:
                 doc.metadata['similarity_score'] = score
                 filtered_results.append(doc)
@@ -198,47 +370,56 @@ class PrimalTCGVectorStore:
         Hybrid search across different document types with weighting.
         Optimized for deck building queries.
         """
-        results = []
-        
-        # Search cards
-        if card_weight > 0:
-            card_results = self.similarity_search(
-                query=query,
-                k=int(k * card_weight),
-                filter={'doc_type': 'card'}
-            )
-            results.extend(card_results)
-        
-        # Search rules
-        if rules_weight > 0:
-            rules_results = self.similarity_search(
-                query=query,
-                k=int(k * rules_weight),
-                filter={'doc_type': 'rules'}
-            )
-            results.extend(rules_results)
-        
-        # Search decks
-        if deck_weight > 0:
-            deck_results = self.similarity_search(
-                query=query,
-                k=int(k * deck_weight),
-                filter={'source': 'deck'}
-            )
-            results.extend(deck_results)
+        if not self.vectorstore:
+            raise ValueError("Vector store not initialized. Call create_vectorstore first.")
         
-        # Remove duplicates while preserving order
+        # Cards, rules and decks, each with its share of k
+        searches = [
+            (int(k * weight), filter)
+            for weight, filter in ((card_weight, {'doc_type': 'card'}),
+                                   (rules_weight, {'doc_type': 'rules'}),
+                                   (deck_weight, {'source': 'deck'}))
+            if weight > 0
+        ]
+        if not searches:
+            return []
+        
+        # Embed the query once and run the filtered searches concurrently;
+        # results are collected in submission order so ranking stays stable
+        embedding = self.embeddings.embed_query(query)
+        with ThreadPoolExecutor(max_workers=len(searches)) as executor:
+            futures = [
+                executor.submit(self._cached_similarity_search, query, sub_k, filter, embedding)
+                for sub_k, filter in searches
+            ]
+            results = [doc for future in futures for doc in future.result()]
+        
+        # Remove duplicates while preserving order (by the ID set in create_vectorstore)
         seen = set()
-        unique_results = []
-        for doc in results:
-            doc_id = doc.page_content[:100]  # Use first 100 chars as ID
-            if doc_id not in seen:
-                seen.add(doc_id)
-                unique_results.append(doc)
+        unique_results = [
+            doc for doc in results
+            if not (doc.metadata['_idx'] in seen or seen.add(doc.metadata['_idx']))
+        ]
         
         return unique_results[:k]
 
 
+# SmartRetriever query types in priority order, with their keywords
+SMART_QUERY_KEYWORDS = (
+    ('deck_building', ('deck', 'build', 'synergy', 'combo', 'works with')),
+    ('card_search', ('card', 'cards', 'show', 'list', 'find', 'search')),
+    ('rules', ('rule', 'how', 'when', 'trigger', 'phase', 'can i', 'legal')),
+    ('comparison', ('compare', 'versus', 'vs', 'better', 'difference')),
+)
+
+# One compiled alternation per query type. No word boundaries: keywords match
+# as substrings (e.g. 'decks', 'building'), exactly like the original checks
+_SMART_QUERY_PATTERNS = tuple(
+    (query_type, re.compile('|'.join(map(re.escape, keywords))))
+    for query_type, keywords in SMART_QUERY_KEYWORDS
+)
+
+
 class SmartRetriever:
     """
     Smart retriever that chooses the best retrieval strategy based on query type.
@@ -254,21 +435,10 @@ class SmartRetriever:
         """
         query_lower = query.lower()
         
-        # Deck building queries
-        if any(word in query_lower for word in ['deck', 'build', 'synergy', 'combo', 'works with']):
-            return 'deck_building'
-        
-        # Card search queries
-        if any(word in query_lower for word in ['card', 'cards', 'show', 'list', 'find', 'search']):
-            return 'card_search'
-        
-        # Rules queries
-        if any(word in query_lower for word in ['rule', 'how', 'when', 'trigger', 'phase', 'can i', 'legal']):
-            return 'rules'
-        
-        # Comparison queries
-        if any(word in query_lower for word in ['compare', 'versus', 'vs', 'better', 'difference']):
-            return 'comparison'
+        # First query type (deck building, card search, rules, comparison) with a keyword in the query
+        for query_type, pattern in _SMART_QUERY_PATTERNS:
+            if pattern.search(query_lower):
+                return query_type
         
         return 'general'
     
@@ -315,4 +485,53 @@ class SmartRetriever:
             return self.vector_store.hybrid_search(
                 query=query,
                 k=k
-            )
\ No newline at end of file
+            )
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Load (once) the tokenizer used to measure document length"""
+    return tiktoken.encoding_for_model(model)
+
+
+class TruncatingRetriever(BaseRetriever):
+    """
+    Retriever wrapper that trims and dedupes documents before they are stuffed
+    into a prompt.
+    
+    Each document is cut to a token budget and repeated documents (same source
+    and opening text) are dropped, which keeps the prompt's context small.
+    """
+    
+    base_retriever: BaseRetriever
+    max_tokens_per_doc: int = 256
+    model: str = "gpt-3.5-turbo"
+    
+    def _truncate(self, text: str) -> str:
+        """Cut text to at most max_tokens_per_doc tokens"""
+        # A token is at least one character, so short texts need no encoding
+        if len(text) <= self.max_tokens_per_doc:
+            return text
+        
+        encoding = _get_encoding(self.model)
+        tokens = encoding.encode(text)
+        if len(tokens) <= self.max_tokens_per_doc:
+            return text
+        return encoding.decode(tokens[:self.max_tokens_per_doc])
+    
+    def _get_relevant_documents(self,
+                                query: str,
+                                *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        docs = self.base_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        
+        seen = set()
+        results = []
+        for doc in docs:
+            doc_id = (doc.metadata.get('source', ''), doc.page_content[:80])
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            results.append(Document(page_content=self._truncate(doc.page_content), metadata=doc.metadata))
+        
+        return results
@@ -0,0 +1,9 @@
+"""
+Shared pytest setup for the Primal TCG Q&A system
+Makes the project packages importable when pytest runs from this directory
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+"""
+Tests for the multi-source document loader
+"""
+
+import os
+
+import pytest
+
+from loaders.document_loader import (
+    PrimalTCGDocumentLoader, RULES_CHUNK_OVERLAP, RULES_CHUNK_SIZE
+)
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "data", "rules.md")
+
+
+def _splits_word(text: str, position: int) -> bool:
+    """True if position falls between two non-whitespace characters"""
+    return 0 < position < len(text) and not text[position - 1].isspace() and not text[position].isspace()
+
+
+def test_rules_windows_never_split_words():
+    words = [f"word{i}" + "x" * (i % 7) for i in range(2000)]
+    text = "# Rules\n" + " ".join(words[:1000]) + "\n## Combat\n" + "\n".join(words[1000:])
+    windows = PrimalTCGDocumentLoader._rules_windows(text)
+    assert len(windows) > 10
+    for start, end in windows:
+        assert not _splits_word(text, start) and not _splits_word(text, end)
+        assert 0 < end - start <= RULES_CHUNK_SIZE + RULES_CHUNK_OVERLAP
+    # Consecutive windows still overlap, so no text is dropped
+    assert all(windows[i + 1][0] <= windows[i][1] for i in range(len(windows) - 1))
+
+
+def test_rules_chunks_are_whole_words():
+    if not os.path.exists(RULES_PATH):
+        pytest.skip("data/rules.md not available")
+    with open(RULES_PATH, encoding="utf-8") as f:
+        text = f.read()
+    chunks = PrimalTCGDocumentLoader(os.path.dirname(RULES_PATH))._split_rules(RULES_PATH)
+    assert chunks
+    words = set(text.split())
+    for chunk in chunks:
+        chunk_words = chunk.page_content.split()
+        assert chunk_words[0] in words and chunk_words[-1] in words
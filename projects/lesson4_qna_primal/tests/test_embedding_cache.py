@@ -0,0 +1,51 @@
+"""
+Tests for the disk-backed query embedding cache
+"""
+
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.embedding_cache import PrecomputedQueryEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeddings that count document and query calls"""
+
+    def __init__(self):
+        self.document_calls = 0
+        self.query_calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.document_calls += 1
+        return [[0.0, 1.0] for _ in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return [float(len(text)), 0.0]
+
+
+def test_preload_embeds_queries_as_queries(tmp_path):
+    base = CountingEmbeddings()
+    embeddings = PrecomputedQueryEmbeddings(base, str(tmp_path / "queries.npz"), model="test")
+    embeddings.preload(["a", "bb", "a"])
+    assert (base.document_calls, base.query_calls) == (0, 2)
+    assert embeddings.embed_query("bb") == [2.0, 0.0]
+    assert base.query_calls == 2
+
+
+def test_preload_reads_the_table_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "queries.npz")
+    PrecomputedQueryEmbeddings(CountingEmbeddings(), path, model="test").preload(["a", "bb"])
+
+    loads = []
+    real_load = np.load
+    monkeypatch.setattr("utils.embedding_cache.np.load",
+                        lambda *args, **kwargs: loads.append(args) or real_load(*args, **kwargs))
+    base = CountingEmbeddings()
+    embeddings = PrecomputedQueryEmbeddings(base, path, model="test")
+    embeddings.preload(["a"])
+    embeddings.preload(["bb"])
+    assert len(loads) == 1
+    assert base.query_calls == 0
@@ -0,0 +1,82 @@
+"""
+Tests for the in-memory NumPy vector store
+"""
+
+import asyncio
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from retrievers.numpy_store import NumpyVectorStore
+
+
+class StatusError(Exception):
+    """Stand-in for an API error carrying an HTTP status"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings that can reject requests with a status code"""
+
+    def __init__(self, status_code: int = None, max_batch: int = None):
+        self.status_code = status_code
+        self.max_batch = max_batch
+        self.calls: List[int] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(len(texts))
+        if self.status_code is not None and (self.max_batch is None or len(texts) > self.max_batch):
+            raise StatusError(self.status_code)
+        return [np.random.default_rng(int(text[1:])).normal(size=16).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+TEXTS = [f"d{i}" for i in range(64)]
+
+
+@pytest.mark.parametrize("status_code", [401, 403, 404, 429, 500])
+def test_non_batch_errors_are_not_retried(status_code):
+    embedding = FakeEmbeddings(status_code=status_code)
+    with pytest.raises(StatusError):
+        NumpyVectorStore(embedding).add_texts(TEXTS)
+    assert embedding.calls == [len(TEXTS)]
+
+
+def test_rate_limit_is_not_retried_async():
+    embedding = FakeEmbeddings(status_code=429)
+    with pytest.raises(StatusError):
+        asyncio.run(NumpyVectorStore(embedding).aadd_texts(TEXTS))
+    assert embedding.calls == [len(TEXTS)]
+
+
+@pytest.mark.parametrize("status_code", [400, 413])
+def test_rejected_batches_are_split(status_code):
+    embedding = FakeEmbeddings(status_code=status_code, max_batch=16)
+    store = NumpyVectorStore(embedding)
+    store.add_texts(TEXTS)
+    assert len(store.ids) == len(TEXTS)
+    assert store.similarity_search("d5", k=1)[0].page_content == "d5"
+
+
+@pytest.mark.parametrize("index", ["flat", "hnsw"])
+def test_search_with_k_zero_returns_nothing(index):
+    store = NumpyVectorStore.from_texts(TEXTS, FakeEmbeddings(), index=index)
+    assert store.similarity_search("d5", k=0) == []
+    assert len(store.similarity_search("d5", k=len(TEXTS) + 10)) == len(TEXTS)
+
+
+def test_search_results_do_not_alias_stored_documents():
+    store = NumpyVectorStore.from_texts(TEXTS, FakeEmbeddings())
+    # threshold_search annotates its results like this
+    for doc, score in store.similarity_search_with_score("d5", k=3, score_threshold=-1.0):
+        doc.metadata["similarity_score"] = score
+    for doc in store.max_marginal_relevance_search("d5", k=3):
+        doc.metadata["similarity_score"] = 0.0
+    assert all("similarity_score" not in doc.metadata for doc in store.similarity_search("d5", k=3))
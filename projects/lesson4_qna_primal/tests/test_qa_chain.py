@@ -0,0 +1,65 @@
+"""
+Tests for the Q&A chains and their shared LLM HTTP clients
+"""
+
+import asyncio
+import http.server
+import threading
+
+import httpx
+import pytest
+from langchain.schema import Document
+
+from chains.qa_chain import PrimalTCGQAChain, _PerLoopAsyncTransport
+
+
+class _OkHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_async_client_survives_successive_event_loops(server_url):
+    client = httpx.AsyncClient(transport=_PerLoopAsyncTransport(httpx.Limits(max_connections=4)))
+
+    async def fetch():
+        return (await client.get(server_url)).text
+
+    # Each asyncio.run() closes its loop; a plain pooled client fails on the second run
+    assert [asyncio.run(fetch()) for _ in range(3)] == ["ok"] * 3
+
+
+def test_with_retriever_copies_question_embeddings():
+    original = PrimalTCGQAChain("first", llm=object(), embeddings=object())
+    original._question_embeddings["q"] = [1.0]
+    original.chains["general"] = object()
+    clone = original.with_retriever("second")
+    clone._question_embeddings["other"] = [2.0]
+    assert list(original._question_embeddings) == ["q"]
+    assert list(clone._question_embeddings) == ["q", "other"]
+    assert clone.chains == {} and original.retriever == "first" and clone.retriever == "second"
+
+
+def test_with_retriever_rejects_cag_mode(monkeypatch):
+    # Skip tiktoken's encoding download; the corpus size check is not under test
+    monkeypatch.setattr(PrimalTCGQAChain, "_build_cag_prompts",
+                        classmethod(lambda cls, corpus, max_tokens: cls._PROMPTS))
+    chain = PrimalTCGQAChain(None, llm=object(), retrieval_mode="cag",
+                             corpus=[Document(page_content="card")])
+    with pytest.raises(ValueError):
+        chain.with_retriever("retriever")
@@ -0,0 +1,70 @@
+"""
+Tests for the in-process semantic response cache
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from utils import semantic_cache
+from utils.semantic_cache import SemanticCache
+
+
+def _unit(rng, dim=32):
+    vector = rng.standard_normal(dim)
+    return vector / np.linalg.norm(vector)
+
+
+def test_lookup_returns_the_most_similar_entry_above_threshold():
+    rng = np.random.default_rng(0)
+    cache = SemanticCache(threshold=0.95, ttl_seconds=None)
+    vectors = [_unit(rng) for _ in range(200)]
+    for i, vector in enumerate(vectors):
+        cache.add(vector, {'answer': i}, namespace='rules')
+
+    near = vectors[42] + 0.01 * _unit(rng)
+    assert cache.lookup(near, namespace='rules') == {'answer': 42}
+    assert cache.lookup(near, namespace='card_search') is None
+    assert cache.lookup(_unit(rng), namespace='rules') is None
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    # Strictly increasing clock, so recency never ties
+    clock = itertools.count(1000)
+    monkeypatch.setattr(semantic_cache.time, 'time', lambda: float(next(clock)))
+    rng = np.random.default_rng(1)
+    cache = SemanticCache(threshold=0.99, ttl_seconds=None, max_entries=2)
+    first, second, third = (_unit(rng) for _ in range(3))
+    cache.add(first, {'answer': 1})
+    cache.add(second, {'answer': 2})
+    assert cache.lookup(first) == {'answer': 1}
+
+    cache.add(third, {'answer': 3})
+    assert cache.lookup(second) is None
+    assert cache.lookup(first) == {'answer': 1}
+    assert cache.lookup(third) == {'answer': 3}
+
+
+def test_redis_search_classes_import_with_installed_redis():
+    pytest.importorskip('redis')
+    assert semantic_cache.redis is not None
+    assert semantic_cache.IndexDefinition is not None
+    assert semantic_cache.Query is not None
+
+
+def test_redis_index_only_covers_queried_fields():
+    redis = pytest.importorskip('redis')
+    created = []
+
+    class FakeIndex:
+        def info(self):
+            raise redis.ResponseError("Unknown index name")
+
+        def create_index(self, fields, definition=None):
+            created.extend(field.name for field in fields)
+
+    cache = semantic_cache.RedisSemanticCache("redis://localhost:6379")
+    cache.client = type("FakeClient", (), {"ft": lambda self, name: FakeIndex()})()
+    cache._ensure_index(8)
+    assert created == ["namespace", "embedding"]
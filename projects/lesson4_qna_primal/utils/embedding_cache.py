@@ -0,0 +1,102 @@
+"""
+Disk-backed cache of query embeddings for the Primal TCG Q&A system
+Serves embeddings of known queries without calling the embedding API
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class PrecomputedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that answers known queries from a preloaded table.
+
+    Design Decision: Wrap the embedding model instead of the vector store
+    - Every search path (similarity, MMR, retrievers inside chains) embeds
+      the query through the same embeddings object, so one wrapper covers all
+    - Unknown texts (including the document corpus) fall through to the
+      wrapped model
+
+    The table is persisted as a compressed .npz file, read once per instance
+    and rewritten when queries are missing from it (or when the embedding
+    model changes). Missing queries are embedded with embed_query, so they
+    never reach a document embedding cache wrapped by base.
+    """
+
+    def __init__(self, base: Embeddings, cache_path: str, model: Optional[str] = None):
+        """
+        Initialize the wrapper.
+
+        Args:
+            base: Embedding model to delegate to
+            cache_path: Path of the .npz file holding precomputed embeddings
+            model: Model name stored with the table (defaults to base.model)
+        """
+        self.base = base
+        self.cache_path = cache_path
+        self.model = model or str(getattr(base, 'model', type(base).__name__))
+        self._vectors: Dict[str, List[float]] = {}
+        self._loaded = False
+
+    def preload(self, queries: List[str]) -> None:
+        """
+        Load embeddings for the given queries, computing and saving missing ones.
+
+        Args:
+            queries: Query strings that will be embedded later
+        """
+        if not self._loaded and os.path.exists(self.cache_path):
+            with np.load(self.cache_path) as data:
+                if str(data['model']) == self.model:
+                    self._vectors.update(zip(data['queries'].tolist(), data['vectors'].tolist()))
+        self._loaded = True
+
+        missing = [q for q in dict.fromkeys(queries) if q not in self._vectors]
+        if not missing:
+            return
+
+        # One request per query, sent concurrently
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            self._vectors.update(zip(missing, executor.map(self.base.embed_query, missing)))
+
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        np.savez_compressed(
+            self.cache_path,
+            model=np.array(self.model),
+            queries=np.array(list(self._vectors)),
+            vectors=np.array(list(self._vectors.values()), dtype=np.float32)
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, serving known queries from the table"""
+        vectors = [self._vectors.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.base.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Return the precomputed embedding of a known query, else embed it"""
+        vector = self._vectors.get(text)
+        return vector if vector is not None else self.base.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async version of embed_documents()"""
+        vectors = [self._vectors.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = await self.base.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async version of embed_query()"""
+        vector = self._vectors.get(text)
+        return vector if vector is not None else await self.base.aembed_query(text)
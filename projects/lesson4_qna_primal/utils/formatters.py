@@ -7,6 +7,28 @@ from tabulate import tabulate
 import re
 
 
+# Numbered items and section headers of rules text, matched in a single pass.
+# A header's \s+ can run onto the following lines, so numbered items inside a
+# header match are bulleted separately (as the old two-pass version did)
+_RULES_FORMAT_PATTERN = re.compile(r'^(?P<item>\d+\.)|^(?P<header>#+\s+.+)$', re.MULTILINE)
+_NUMBERED_ITEM_PATTERN = re.compile(r'^(\d+\.)', re.MULTILINE)
+
+# Card entries in LLM output
+_CARD_NAME_PATTERN = re.compile(r"Card Name: ([^\n]+)")
+
+
+def _format_rules_match(match: re.Match) -> str:
+    """Bullet a numbered item or bold a section header"""
+    if match.group('item'):
+        return '• ' + match.group('item')
+    return '**' + _NUMBERED_ITEM_PATTERN.sub(r'• \1', match.group('header')) + '**'
+
+
+def _effect_preview(effect: str) -> str:
+    """First 50 characters of a card effect, with an ellipsis if it was cut"""
+    return effect[:50] + "..." if len(effect) > 50 else effect
+
+
 class ResponseFormatter:
     """Format Q&A responses for better readability"""
     
@@ -28,16 +50,17 @@ class ResponseFormatter:
         headers = ["Name", "Type", "Cost", "Elements", "Effect (Preview)", "Rarity"]
         
         # Prepare table data
-        table_data = []
-        for card in cards:
-            name = card.get('name', 'Unknown')
-            card_type = card.get('card_type', 'Unknown')
-            cost = card.get('cost', 'N/A')
-            elements = card.get('elements', 'N/A')
-            effect = card.get('effect', 'No effect')[:50] + "..." if len(card.get('effect', '')) > 50 else card.get('effect', 'No effect')
-            rarity = card.get('rarity', 'Unknown')
-            
-            table_data.append([name, card_type, cost, elements, effect, rarity])
+        table_data = [
+            [
+                card.get('name', 'Unknown'),
+                card.get('card_type', 'Unknown'),
+                card.get('cost', 'N/A'),
+                card.get('elements', 'N/A'),
+                _effect_preview(card.get('effect', 'No effect')),
+                card.get('rarity', 'Unknown')
+            ]
+            for card in cards
+        ]
         
         # Create table
         return tabulate(table_data, headers=headers, tablefmt="pipe")
@@ -87,16 +110,7 @@ class ResponseFormatter:
         Returns:
             List of card dictionaries
         """
-        cards = []
-        
-        # Pattern to match card entries
-        card_pattern = r"Card Name: ([^\n]+)"
-        
-        matches = re.findall(card_pattern, text)
-        for match in matches:
-            cards.append({'name': match})
-        
-        return cards
+        return [{'name': match.group(1)} for match in _CARD_NAME_PATTERN.finditer(text)]
     
     @staticmethod
     def format_rules_clarification(rules_text: str) -> str:
@@ -109,13 +123,8 @@ class ResponseFormatter:
         Returns:
             Formatted rules text
         """
-        # Add bullet points for numbered items
-        rules_text = re.sub(r'^(\d+\.)', r'• \1', rules_text, flags=re.MULTILINE)
-        
-        # Bold section headers
-        rules_text = re.sub(r'^(#+\s+.+)$', r'**\1**', rules_text, flags=re.MULTILINE)
-        
-        return rules_text
+        # Add bullet points for numbered items and bold section headers
+        return _RULES_FORMAT_PATTERN.sub(_format_rules_match, rules_text)
     
     @staticmethod
     def format_comparison_table(items: List[Dict[str, Any]], attributes: List[str]) -> str:
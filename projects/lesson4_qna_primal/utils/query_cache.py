@@ -0,0 +1,148 @@
+"""
+In-process query cache for the Primal TCG Q&A system
+Keeps query embeddings and search results for repeated queries
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache with a time-to-live.
+
+    Design Decision: OrderedDict under a lock
+    - Lookups and inserts are O(1); a hit moves the key to the end, so the
+      first key is always the least recently used one to evict
+    - Entries older than ttl_seconds are dropped when they are looked up
+    - Searches may run from several threads at once, so every access holds
+      an RLock
+    """
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: Optional[float] = 600):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries before the least recently used is evicted
+            ttl_seconds: Entry lifetime in seconds (None = never expire)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None \
+                    and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries (statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class CachedEmbedder(Embeddings):
+    """
+    Embeddings wrapper that answers repeated queries from a QueryCache.
+
+    Only query embeddings are cached; document batches go straight to the
+    wrapped model. Keys include the model name, so one cache can be shared
+    by several models.
+    """
+
+    def __init__(self, base: Embeddings, cache: QueryCache, model: Optional[str] = None):
+        """
+        Initialize the wrapper.
+
+        Args:
+            base: Embedding model to delegate to
+            cache: Cache holding query embeddings
+            model: Model name used in cache keys (defaults to base.model)
+        """
+        self.base = base
+        self.cache = cache
+        self.model = model or str(getattr(base, 'model', type(base).__name__))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the wrapped model"""
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Return the cached embedding of a repeated query, else embed and cache it"""
+        key = (self.model, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = np.asarray(self.base.embed_query(text), dtype=np.float32)
+            self.cache.put(key, vector)
+        return vector.tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async version of embed_documents()"""
+        return await self.base.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async version of embed_query()"""
+        key = (self.model, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = np.asarray(await self.base.aembed_query(text), dtype=np.float32)
+            self.cache.put(key, vector)
+        return vector.tolist()
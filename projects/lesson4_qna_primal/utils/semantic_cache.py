@@ -0,0 +1,315 @@
+"""
+Semantic response cache for the Primal TCG Q&A system
+Reuses answers for questions that are near-duplicates of earlier ones
+"""
+
+import bisect
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain.schema import Document
+
+try:
+    import redis
+except ImportError:  # Redis backend is optional
+    redis = None
+
+if redis is not None:
+    from redis.commands.search.field import TagField, VectorField
+    from redis.commands.search.query import Query
+    try:
+        from redis.commands.search.index_definition import IndexDefinition, IndexType
+    except ImportError:  # redis-py < 6 names the module indexDefinition
+        from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+
+
+INITIAL_CAPACITY = 64
+
+
+class _CachePartition:
+    """Cached embeddings and results for a single chain type"""
+
+    def __init__(self, dim: int):
+        # Rows [0, size) are in use; capacity doubles when full
+        self.matrix = np.empty((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.size = 0
+        self.results: List[Dict[str, Any]] = []
+        self.created: List[float] = []
+        self.last_used: List[float] = []
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the rows in use"""
+        return self.matrix[:self.size]
+
+    def append(self, vector: np.ndarray) -> None:
+        """Store a row, growing the buffer by 2x when it is full"""
+        if self.size == self.matrix.shape[0]:
+            grown = np.empty((2 * self.size, self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+        self.matrix[self.size] = vector
+        self.size += 1
+
+    def drop_oldest(self, count: int) -> None:
+        """Remove the first `count` rows, keeping the buffer in place"""
+        remaining = self.size - count
+        self.matrix[:remaining] = self.matrix[count:self.size]
+        self.size = remaining
+        del self.results[:count]
+        del self.created[:count]
+        del self.last_used[:count]
+
+    def remove(self, index: int) -> None:
+        """Remove one row, shifting later rows down so creation order is kept"""
+        self.matrix[index:self.size - 1] = self.matrix[index + 1:self.size]
+        self.size -= 1
+        del self.results[index]
+        del self.created[index]
+        del self.last_used[index]
+
+
+class SemanticCache:
+    """
+    Cache of Q&A results keyed by question embedding.
+
+    Design Decision: Cosine lookup over a dense embedding matrix
+    - Each cached question is stored as a normalized float32 row of one
+      contiguous, preallocated buffer (grown by doubling)
+    - A lookup is one BLAS matrix-vector product against all rows
+    - Results are partitioned by chain type so answers produced by
+      different prompts are never mixed
+
+    Entries older than the TTL are dropped on the next lookup, and when a
+    partition exceeds max_entries its least recently used entry is evicted.
+    """
+
+    def __init__(self,
+                 threshold: float = 0.9,
+                 ttl_seconds: Optional[float] = 3600,
+                 max_entries: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            ttl_seconds: Lifetime of an entry (None keeps entries forever)
+            max_entries: Maximum entries per partition (None for no limit)
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._partitions: Dict[str, _CachePartition] = {}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, partition: _CachePartition) -> None:
+        """Drop entries older than the TTL (entries are stored oldest first)"""
+        if self.ttl_seconds is None or not partition.created:
+            return
+
+        cutoff = bisect.bisect_left(partition.created, time.time() - self.ttl_seconds)
+        if cutoff:
+            partition.drop_oldest(cutoff)
+
+    def lookup(self, embedding, namespace: str = "default") -> Optional[Dict[str, Any]]:
+        """
+        Find the cached result of the most similar earlier question.
+
+        Args:
+            embedding: Embedding of the incoming question
+            namespace: Cache partition (the chain type)
+
+        Returns:
+            The cached result, or None when no entry reaches the threshold
+        """
+        partition = self._partitions.get(namespace)
+        if partition is None:
+            return None
+
+        self._expire(partition)
+        if not partition.results:
+            return None
+
+        similarities = partition.vectors @ self._normalize(embedding)
+        best = int(similarities.argmax())
+        if similarities[best] < self.threshold:
+            return None
+        partition.last_used[best] = time.time()
+        return partition.results[best]
+
+    def add(self, embedding, result: Dict[str, Any], namespace: str = "default") -> None:
+        """
+        Store a result under its question embedding.
+
+        Args:
+            embedding: Embedding of the question
+            result: Result dictionary to return on later hits
+            namespace: Cache partition (the chain type)
+        """
+        vector = self._normalize(embedding)
+        partition = self._partitions.get(namespace)
+        if partition is None:
+            partition = self._partitions[namespace] = _CachePartition(vector.shape[0])
+
+        now = time.time()
+        partition.append(vector)
+        partition.results.append(result)
+        partition.created.append(now)
+        partition.last_used.append(now)
+
+        if self.max_entries is not None and partition.size > self.max_entries:
+            partition.remove(int(np.argmin(partition.last_used)))
+
+    def clear(self) -> None:
+        """Remove all cached entries"""
+        self._partitions.clear()
+
+
+class RedisSemanticCache:
+    """
+    Semantic cache stored in Redis, shared across processes and runs.
+
+    Design Decision: RediSearch HNSW vector index keyed by question embedding
+    - Same interface as SemanticCache (lookup/add/clear)
+    - Entries carry a namespace tag (the chain type) and lookups filter on it,
+      so answers from different prompts are never mixed
+    - Each entry expires after the TTL (24h by default) so answers do not
+      outlive card database updates
+
+    Results are stored as JSON (answer text and source documents).
+    """
+
+    def __init__(self,
+                 redis_url: str,
+                 threshold: float = 0.9,
+                 ttl_seconds: Optional[float] = 24 * 3600,
+                 index_name: str = "primal_qa_cache"):
+        """
+        Initialize the cache.
+
+        Args:
+            redis_url: Redis connection URL (requires the RediSearch module)
+            threshold: Minimum cosine similarity for a cache hit
+            ttl_seconds: Lifetime of an entry (None keeps entries forever)
+            index_name: Name of the vector index (also the key prefix)
+        """
+        if redis is None:
+            raise ImportError("RedisSemanticCache requires the redis package: pip install redis")
+
+        self.client = redis.Redis.from_url(redis_url)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.index_name = index_name
+        self.key_prefix = f"{index_name}:"
+        self._index_ready = False
+
+    def _ensure_index(self, dim: int) -> None:
+        """Create the vector index on first use"""
+        if self._index_ready:
+            return
+
+        index = self.client.ft(self.index_name)
+        try:
+            index.info()
+        except redis.ResponseError:
+            index.create_index(
+                [
+                    TagField("namespace"),
+                    VectorField("embedding", "HNSW", {
+                        "TYPE": "FLOAT32",
+                        "DIM": dim,
+                        "DISTANCE_METRIC": "COSINE"
+                    })
+                ],
+                definition=IndexDefinition(prefix=[self.key_prefix], index_type=IndexType.HASH)
+            )
+        self._index_ready = True
+
+    @staticmethod
+    def _encode(result: Dict[str, Any]) -> str:
+        """Serialize a result dictionary to JSON"""
+        return json.dumps({
+            'result': result.get('result'),
+            'chain_type': result.get('chain_type'),
+            'source_documents': [
+                {'page_content': doc.page_content, 'metadata': doc.metadata}
+                for doc in result.get('source_documents', [])
+            ]
+        }, default=str)
+
+    @staticmethod
+    def _decode(payload) -> Dict[str, Any]:
+        """Rebuild a result dictionary from JSON"""
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        data = json.loads(payload)
+        data['source_documents'] = [Document(**doc) for doc in data['source_documents']]
+        return data
+
+    def lookup(self, embedding, namespace: str = "default") -> Optional[Dict[str, Any]]:
+        """
+        Find the cached result of the most similar earlier question.
+
+        Args:
+            embedding: Embedding of the incoming question
+            namespace: Cache partition (the chain type)
+
+        Returns:
+            The cached result, or None when no entry reaches the threshold
+        """
+        vector = SemanticCache._normalize(embedding)
+        self._ensure_index(vector.shape[0])
+
+        tag = re.sub(r'(\W)', r'\\\1', namespace)
+        query = (
+            Query(f"(@namespace:{{{tag}}})=>[KNN 1 @embedding $vec AS distance]")
+            .sort_by("distance")
+            .return_fields("distance", "result")
+            .dialect(2)
+        )
+        docs = self.client.ft(self.index_name).search(query, query_params={"vec": vector.tobytes()}).docs
+        # Cosine distance is 1 - similarity
+        if not docs or 1 - float(docs[0].distance) < self.threshold:
+            return None
+        return self._decode(docs[0].result)
+
+    def add(self, embedding, result: Dict[str, Any], namespace: str = "default") -> None:
+        """
+        Store a result under its question embedding.
+
+        Args:
+            embedding: Embedding of the question
+            result: Result dictionary to return on later hits
+            namespace: Cache partition (the chain type)
+        """
+        vector = SemanticCache._normalize(embedding)
+        self._ensure_index(vector.shape[0])
+
+        key = self.key_prefix + uuid.uuid4().hex
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={
+            "namespace": namespace,
+            "embedding": vector.tobytes(),
+            "result": self._encode(result)
+        })
+        if self.ttl_seconds is not None:
+            pipe.expire(key, int(self.ttl_seconds))
+        pipe.execute()
+
+    def clear(self) -> None:
+        """Remove all cached entries and the index"""
+        try:
+            self.client.ft(self.index_name).dropindex(delete_documents=True)
+        except redis.ResponseError:
+            pass
+        self._index_ready = False